@@ -1,3 +1,18 @@
 from django.contrib import admin
+from accounts.models import OutboxEmail
 
 # Register your models here.
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    model = OutboxEmail
+    list_display = ("subject", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status",)
+    # the body can carry a live password reset link, staff only get to see who a message is for
+    exclude = ("message",)
+    readonly_fields = ("from_email", "recipients", "subject", "attempts", "last_error", "created_at", "sent_at")
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
@@ -0,0 +1,164 @@
+import logging
+import smtplib
+import uuid
+from datetime import timedelta
+from email import message_from_bytes
+from email.message import Message
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import MIMEMixin, sanitize_address
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    Store outgoing mail in the database instead of talking to SMTP inside the request.
+
+    The send_outbox management command delivers the stored messages in batches.
+    """
+
+    def send_messages(self, email_messages):
+        rows = []
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            # prepared the same way the SMTP backend does it, so delivery only has to replay the bytes
+            encoding = message.encoding or settings.DEFAULT_CHARSET
+            rows.append(OutboxEmail(
+                from_email=sanitize_address(message.from_email, encoding),
+                recipients=[sanitize_address(address, encoding) for address in message.recipients()],
+                subject=str(message.subject)[:255],
+                message=message.message().as_bytes(linesep='\r\n').decode('utf-8'),
+            ))
+        OutboxEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_DELAY', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), getattr(settings, 'OUTBOX_MAX_RETRY_DELAY', 3600)))
+
+
+class StoredMIMEMessage(MIMEMixin, Message):
+    """A parsed outbox message, serialised with the linesep argument the mail backends pass"""
+
+
+class StoredMessage(EmailMessage):
+    """An EmailMessage rebuilt from an outbox row, so every mail backend can deliver it"""
+
+    def __init__(self, email):
+        super().__init__(subject=email.subject, from_email=email.from_email, to=list(email.recipients))
+        self.raw = email.message
+
+    def recipients(self):
+        # the stored addresses are already sanitized, the headers of the raw message are what recipients see
+        return self.to
+
+    def message(self):
+        return message_from_bytes(self.raw.encode('utf-8'), _class=StoredMIMEMessage)
+
+
+def _failed(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.lease = ''
+    if email.attempts >= max_attempts:
+        email.status = OutboxEmail.FAILED
+        # a message that is never sent again has no use for its body, which may hold a live reset link
+        email.message = ''
+    else:
+        email.status = OutboxEmail.PENDING
+        email.next_attempt_at = timezone.now() + _retry_delay(email.attempts)
+    email.save(update_fields=['attempts', 'last_error', 'lease', 'status', 'next_attempt_at', 'message'])
+
+
+def _sent(email):
+    email.status = OutboxEmail.SENT
+    email.sent_at = timezone.now()
+    email.attempts += 1
+    email.last_error = ''
+    email.lease = ''
+    # password reset links stay valid for days, don't keep them readable in the database
+    email.message = ''
+    email.save(update_fields=['status', 'sent_at', 'attempts', 'last_error', 'lease', 'message'])
+
+
+def claim_batch(batch_size=100):
+    """
+    Mark a batch of due messages as sending under a new lease and return them.
+
+    The claim is a short transaction of its own, sending happens afterwards. A message whose
+    worker died while sending becomes due again when its lease runs out.
+    """
+    now = timezone.now()
+    lease = uuid.uuid4().hex
+    due = (
+        OutboxEmail.objects.filter(status__in=[OutboxEmail.PENDING, OutboxEmail.SENDING], next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'id')
+    )
+    with transaction.atomic():
+        candidates = due
+        if db_connection.features.has_select_for_update_skip_locked:
+            # several workers can drain the outbox without picking the same rows
+            candidates = due.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        # repeating the due condition makes a row claimed by a concurrent worker drop out here
+        expires = now + timedelta(seconds=getattr(settings, 'OUTBOX_SENDING_TIMEOUT', 300))
+        due.filter(id__in=ids).update(status=OutboxEmail.SENDING, lease=lease, next_attempt_at=expires)
+    return list(OutboxEmail.objects.filter(lease=lease, status=OutboxEmail.SENDING).order_by('id'))
+
+
+def deliver_batch(batch_size=100, max_attempts=5):
+    """
+    Send one batch of due outbox messages over a single mail connection.
+
+    Returns (sent, failed) counts for the batch.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    sent = failed = 0
+    backend = get_connection(getattr(settings, 'OUTBOX_DELIVERY_BACKEND', 'django.core.mail.backends.smtp.EmailBackend'))
+    # any backend can be configured, whatever it raises must not leave claimed rows behind
+    try:
+        backend.open()
+    except Exception as e:
+        logger.warning("Outbox could not connect to the mail server: %s", e)
+        for email in emails:
+            _failed(email, e, max_attempts)
+        return 0, len(emails)
+
+    try:
+        for i, email in enumerate(emails):
+            try:
+                backend.send_messages([StoredMessage(email)])
+            except Exception as e:
+                logger.warning("Outbox could not send message %s: %s", email.id, e)
+                _failed(email, e, max_attempts)
+                failed += 1
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    backend.close()
+                    try:
+                        backend.open()
+                    except Exception as e:
+                        for email in emails[i + 1:]:
+                            _failed(email, e, max_attempts)
+                        return sent, failed + len(emails) - i - 1
+            else:
+                # recorded right away, so nothing that happens later in the batch sends it twice
+                _sent(email)
+                sent += 1
+    finally:
+        backend.close()
+    return sent, failed
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails in batches, one SMTP connection per batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new emails")
+        parser.add_argument('--interval', type=float, default=5, help="Seconds to wait when the outbox is empty")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            try:
+                sent, failed = deliver_batch(options['batch_size'], options['max_attempts'])
+            except Exception as e:
+                if not options['loop']:
+                    raise
+                # a worker that exits on a network hiccup would leave the outbox undrained
+                self.stderr.write(f"Delivery failed: {e}")
+                sent, failed = 0, 0
+
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Outbox drained: {total_sent} sent, {total_failed} failed"))
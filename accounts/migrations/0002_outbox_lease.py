@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='lease',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='outboxemail',
+            name='status',
+            field=models.CharField(choices=[('PE', 'Pending'), ('SN', 'Sending'), ('SE', 'Sent'), ('FA', 'Failed')], default='PE', max_length=2),
+        ),
+    ]
@@ -1,3 +1,33 @@
 from django.db import models
 
-# Create your models here.
+
+class OutboxEmail(models.Model):
+    PENDING = 'PE'
+    SENDING = 'SN'
+    SENT = 'SE'
+    FAILED = 'FA'
+    STATUS_OPTIONS = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField()
+    subject = models.CharField(max_length=255, blank=True)
+    message = models.TextField()  # the full MIME message as it will be handed to the mail backend, cleared once delivered
+    status = models.CharField(max_length=2, choices=STATUS_OPTIONS, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # while sending, the time the claim expires and another worker may pick the message up again
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    lease = models.CharField(max_length=32, blank=True, editable=False)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')]
+
+    def __str__(self):
+        return f"{self.subject} | {', '.join(self.recipients)}"
@@ -1,3 +1,158 @@
-from django.test import TestCase
+import io
+import socketserver
+import threading
+from contextlib import redirect_stdout
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.mail import claim_batch, deliver_batch
+from accounts.models import OutboxEmail
 
 # Create your tests here.
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for smtplib to deliver messages"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost test server')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                if server.reject:
+                    self.reply('451 try again later')
+                    continue
+                sender, recipients = line[10:].strip('<>'), []
+                self.reply('250 ok')
+            elif command == 'RCPT':
+                recipients.append(line[8:].strip('<>'))
+                self.reply('250 ok')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk)
+                server.messages.append((sender, recipients, b''.join(data)))
+                self.reply('250 queued')
+            else:
+                self.reply('250 ok')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.reject = False
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.server = SMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        override = override_settings(
+            EMAIL_BACKEND='accounts.mail.OutboxEmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_password_reset_is_queued(self):
+        """Test that requesting a password reset only writes to the outbox"""
+        User.objects.create_user(username="testuser", email="test@example.com", password="password123")
+        self.client.post(reverse('password_reset'), {'email': 'test@example.com'})
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.PENDING).count(), 1)
+        self.assertEqual(self.server.messages, [])
+
+    def test_batch_uses_one_connection(self):
+        """Test that a batch is delivered over a single SMTP connection"""
+        for i in range(3):
+            mail.send_mail(f"Subject {i}", "Body", "from@example.com", [f"user{i}@example.com"])
+
+        self.assertEqual(deliver_batch(), (3, 0))
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual([i[1] for i in self.server.messages], [[f"user{i}@example.com"] for i in range(3)])
+        self.assertIn(b'Subject: Subject 0', self.server.messages[0][2])
+        self.assertEqual(OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 3)
+        # delivered bodies are not kept
+        self.assertFalse(OutboxEmail.objects.exclude(message='').exists())
+
+    @override_settings(OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_other_delivery_backends(self):
+        """Test that the stored messages can be handed to any mail backend"""
+        mail.send_mail("Grüße", "Body ✓", "from@example.com", ["user@example.com"])
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        message = mail.outbox[0]
+        self.assertEqual(message.recipients(), ["user@example.com"])
+        self.assertEqual(message.message()['Subject'], "=?utf-8?b?R3LDvMOfZQ==?=")
+        self.assertIn("Body ✓", message.message().get_payload(decode=True).decode())
+
+        mail.send_mail("Subject", "Body", "from@example.com", ["user@example.com"])
+        with self.settings(OUTBOX_DELIVERY_BACKEND='django.core.mail.backends.console.EmailBackend'):
+            stream = io.StringIO()
+            with redirect_stdout(stream):
+                self.assertEqual(deliver_batch(), (1, 0))
+        self.assertIn("Subject: Subject", stream.getvalue())
+
+    def test_admin_hides_message_body(self):
+        """Test that staff can't read stored messages, which may hold password reset links"""
+        mail.send_mail("Subject", "Secret link", "from@example.com", ["user@example.com"])
+        admin = User.objects.create_superuser(username="admin", email="admin@example.com", password="password123")
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:accounts_outboxemail_change', args=[OutboxEmail.objects.get().id]))
+        self.assertContains(response, "user@example.com")
+        self.assertNotContains(response, "Secret link")
+
+    def test_retry_with_backoff(self):
+        """Test that failed messages are retried later and given up after the last attempt"""
+        mail.send_mail("Subject", "Body", "from@example.com", ["user@example.com"])
+        self.server.reject = True
+
+        with self.assertLogs('accounts.mail', 'WARNING'):
+            self.assertEqual(deliver_batch(max_attempts=2), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=30))
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 0))
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs('accounts.mail', 'WARNING'):
+            self.assertEqual(deliver_batch(max_attempts=2), (0, 1))
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.FAILED)
+
+    def test_claimed_messages_are_not_sent_twice(self):
+        """Test that messages claimed by another worker are left alone until the claim expires"""
+        mail.send_mail("Subject", "Body", "from@example.com", ["user@example.com"])
+        self.assertEqual(len(claim_batch()), 1)
+        self.assertEqual(deliver_batch(), (0, 0))
+
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(), (1, 0))
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.SENT)
+        self.assertEqual(email.lease, '')
+        self.assertEqual(len(self.server.messages), 1)
@@ -1,8 +1,55 @@
 from django.contrib import admin
-from courses.models import CourseCategory, Course, CourseLesson, CourseEnrollment, CourseInstructor
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from courses.models import CourseCategory, Course, CourseLesson, CourseEnrollment, CourseInstructor, CertificateJob
 
 # Register your models here.
 
+# below this many rows an exact count is cheap enough and always correct
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+
+def estimate_row_count(model, using='default'):
+    """Row count from the database statistics, or None when the backend keeps none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        elif connection.vendor == 'sqlite':
+            # sqlite_stat1 only exists after ANALYZE has been run
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that uses the table statistics instead of COUNT(*) for unfiltered large tables"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
 class CourseLessonInline(admin.StackedInline):
     model = CourseLesson
     extra = 0
@@ -15,8 +62,13 @@ class CourseAdmin(admin.ModelAdmin):
 
 class CourseEnrollmentAdmin(admin.ModelAdmin):
     model = CourseEnrollment
+    list_display = ("__str__", "approved", "entrolled_at", "completed_date")
+    list_select_related = ("course", "user")
     search_fields = ("user__username", "course__title")
+    search_help_text = "Search by the beginning of a username or a course title"
     list_filter = ("approved",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     readonly_fields = ("course", "user", "current_lesson", "attended_lessons")
 
     def get_readonly_fields(self, request, obj):
@@ -24,6 +76,17 @@ class CourseEnrollmentAdmin(admin.ModelAdmin):
         if obj.approved:
             return ("approved", "course", "user", "current_lesson", "attended_lessons", "completed_date")
         return fields
+
+    def get_search_results(self, request, queryset, search_term):
+        # a prefix written as a range reads the username and title indexes, LIKE across the joins scans every enrollment
+        term = search_term.strip()
+        if term:
+            end = term + '\U0010ffff'
+            queryset = queryset.filter(
+                Q(user__in=User.objects.filter(username__gte=term, username__lt=end))
+                | Q(course__in=Course.objects.filter(title__gte=term, title__lt=end))
+            )
+        return queryset, False
     
     def has_add_permission(self, request):
         return False
@@ -32,10 +95,28 @@ class CourseEnrollmentAdmin(admin.ModelAdmin):
         return {}
 
 
+class CertificateJobAdmin(admin.ModelAdmin):
+    model = CertificateJob
+    list_display = ("__str__", "status", "attempts", "created_at", "finished_at")
+    list_filter = ("status",)
+    list_select_related = ("enrollment",)
+    readonly_fields = ("enrollment", "status", "file", "attempts", "last_error", "created_at", "started_at", "finished_at")
+    actions = ("render_again",)
+
+    @admin.action(description="Render selected certificates again")
+    def render_again(self, request, queryset):
+        count = queryset.update(status=CertificateJob.PENDING, attempts=0, last_error='')
+        self.message_user(request, f"{count} certificates queued")
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(CourseCategory)
 admin.site.register(Course, CourseAdmin)
 admin.site.register(CourseEnrollment, CourseEnrollmentAdmin)
 admin.site.register(CourseInstructor)
+admin.site.register(CertificateJob, CertificateJobAdmin)
 admin.site.site_title = "E-Learner"
 admin.site.site_header = "E-Learner"
 admin.site.index_title = "E-Learner Administration"
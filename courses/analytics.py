@@ -0,0 +1,190 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import (
+    AnalyticsWatermark, CourseAttendance, CourseDailyStats, CourseEnrollment, LessonDailyStats
+)
+
+
+ROLLUP_BATCH_SIZE = 5000
+ATTENDANCE_WATERMARK = 'attendance'
+COMPLETION_WATERMARK = 'completion'
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def _get_watermark(name):
+    watermark, _ = AnalyticsWatermark.objects.select_for_update().get_or_create(name=name)
+    return watermark
+
+
+def _upsert_course_stats(keys):
+    """Return the CourseDailyStats rows for the given (course_id, day) keys, creating missing ones"""
+    course_ids = {course_id for course_id, _ in keys}
+    days = {day for _, day in keys}
+    existing = {
+        (row.course_id, row.day): row
+        for row in CourseDailyStats.objects.filter(course_id__in=course_ids, day__in=days)
+    }
+    missing = [CourseDailyStats(course_id=course_id, day=day) for course_id, day in keys if (course_id, day) not in existing]
+    for row in CourseDailyStats.objects.bulk_create(missing):
+        existing[(row.course_id, row.day)] = row
+    # bulk_create does not return primary keys on every backend
+    if any(row.pk is None for row in existing.values()):
+        existing = {
+            (row.course_id, row.day): row
+            for row in CourseDailyStats.objects.filter(course_id__in=course_ids, day__in=days)
+        }
+    return existing
+
+
+def _grace_cutoff(now):
+    # event times are set before their transaction commits, so a row with a lower id or an earlier
+    # time may still show up after a newer one was read. Only events older than the grace period are read.
+    return now - timedelta(seconds=getattr(settings, 'ANALYTICS_GRACE_SECONDS', 300))
+
+
+def _process_attendance_batch(batch_size, now):
+    cutoff = _grace_cutoff(now)
+    with transaction.atomic():
+        watermark = _get_watermark(ATTENDANCE_WATERMARK)
+        rows = []
+        candidates = (
+            CourseAttendance.objects
+            .filter(id__gt=watermark.last_id)
+            .order_by('id')
+            .values_list('id', 'courselesson_id', 'courselesson__course_id', 'attended_at')[:batch_size]
+        )
+        for row in candidates:
+            # the watermark can only move past ids whose gaps can no longer fill, stop at the first recent event
+            if row[3] > cutoff:
+                break
+            rows.append(row)
+        if not rows:
+            return 0
+
+        lesson_counts = defaultdict(int)
+        course_counts = defaultdict(int)
+        for _, lesson_id, course_id, attended_at in rows:
+            day = timezone.localdate(attended_at)
+            lesson_counts[(lesson_id, course_id, day)] += 1
+            course_counts[(course_id, day)] += 1
+
+        lesson_ids = {lesson_id for lesson_id, _, _ in lesson_counts}
+        days = {day for _, _, day in lesson_counts}
+        existing = {
+            (row.lesson_id, row.day): row
+            for row in LessonDailyStats.objects.filter(lesson_id__in=lesson_ids, day__in=days)
+        }
+        to_create = []
+        for (lesson_id, course_id, day), count in lesson_counts.items():
+            row = existing.get((lesson_id, day))
+            if row is None:
+                to_create.append(LessonDailyStats(lesson_id=lesson_id, course_id=course_id, day=day, attendances=count))
+            else:
+                row.attendances += count
+        LessonDailyStats.objects.bulk_update(existing.values(), ['attendances'])
+        LessonDailyStats.objects.bulk_create(to_create)
+
+        course_stats = _upsert_course_stats(course_counts.keys())
+        for key, count in course_counts.items():
+            row = course_stats[key]
+            row.attendances += count
+            # distinct learners can't be summed across batches, so recount the touched day from the indexed events
+            start, end = _day_bounds(key[1])
+            row.active_learners = (
+                CourseAttendance.objects
+                .filter(courselesson__course_id=key[0], attended_at__gte=start, attended_at__lt=end)
+                .values('courseenrollment_id').distinct().count()
+            )
+        CourseDailyStats.objects.bulk_update([course_stats[key] for key in course_counts], ['attendances', 'active_learners'])
+
+        watermark.last_id = rows[-1][0]
+        watermark.save()
+        return len(rows)
+
+
+def _process_completions(now):
+    cutoff = _grace_cutoff(now)
+    with transaction.atomic():
+        watermark = _get_watermark(COMPLETION_WATERMARK)
+        if watermark.last_timestamp is not None and watermark.last_timestamp >= cutoff:
+            return 0
+        completions = CourseEnrollment.objects.filter(completed_date__lte=cutoff)
+        if watermark.last_timestamp is not None:
+            completions = completions.filter(completed_date__gt=watermark.last_timestamp)
+
+        counts = defaultdict(int)
+        for course_id, completed_date in completions.values_list('course_id', 'completed_date').iterator():
+            counts[(course_id, timezone.localdate(completed_date))] += 1
+
+        if counts:
+            course_stats = _upsert_course_stats(counts.keys())
+            for key, count in counts.items():
+                course_stats[key].completions += count
+            CourseDailyStats.objects.bulk_update([course_stats[key] for key in counts], ['completions'])
+
+        watermark.last_timestamp = cutoff
+        watermark.save()
+        return sum(counts.values())
+
+
+def refresh_rollups(batch_size=ROLLUP_BATCH_SIZE):
+    """
+    Fold new attendance and completion events into the daily rollup tables.
+
+    Each source keeps a watermark (last attendance id, last completion timestamp),
+    so a run only reads the events that arrived since the previous one. Events are
+    counted once they are ANALYTICS_GRACE_SECONDS old.
+    """
+    now = timezone.now()
+    attendances = 0
+    while True:
+        processed = _process_attendance_batch(batch_size, now)
+        attendances += processed
+        if processed < batch_size:
+            break
+
+    completions = _process_completions(now)
+    return {'attendances': attendances, 'completions': completions}
+
+
+def get_report(start, end, course_id=None):
+    """
+    Summaries for the admin report, read from the rollup tables only.
+
+    Active learners are only reported for a single course, a learner active in two courses
+    would be counted twice in a sum over all of them.
+    """
+    daily = CourseDailyStats.objects.filter(day__gte=start, day__lte=end)
+    totals = {'attended': Sum('attendances'), 'completed': Sum('completions')}
+    if course_id:
+        daily = daily.filter(course_id=course_id)
+        totals['learners'] = Sum('active_learners')
+
+    days = list(daily.values('day').annotate(**totals).order_by('day'))
+
+    funnel = []
+    if course_id:
+        lessons = (
+            LessonDailyStats.objects.filter(course_id=course_id)
+            .values('lesson_id', 'lesson__title')
+            .annotate(learners=Sum('attendances'))
+            .order_by('lesson_id')
+        )
+        previous = None
+        for lesson in lessons:
+            learners = lesson['learners']
+            drop_off = 0 if not previous else round((previous - learners) / previous * 100, 2)
+            funnel.append({'lesson_id': lesson['lesson_id'], 'title': lesson['lesson__title'], 'learners': learners, 'drop_off': drop_off})
+            previous = learners
+
+    return {'days': days, 'funnel': funnel}
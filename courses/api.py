@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.generic import View
+
+from .models import Course, CourseAttendance, CourseEnrollment, CourseLesson
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# public field name -> values() lookup
+COURSE_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'difficulty': 'difficulty',
+    'duration_weeks': 'duration_weeks',
+    'thumbnail': 'thumbnail',
+    'created_at': 'created_at',
+    'category': 'category_id',
+    'category_title': 'category__title',
+    'instructor': 'instructor_id',
+    'instructor_name': 'instructor__name',
+}
+DEFAULT_COURSE_FIELDS = ['id', 'title', 'difficulty', 'duration_weeks', 'thumbnail', 'category', 'category_title']
+LESSON_FIELDS = {'id': 'id', 'title': 'title', 'brief': 'brief', 'youtube_link': 'youtube_link'}
+DEFAULT_LESSON_FIELDS = ['id', 'title', 'brief']
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _select_fields(request, available, default):
+    requested = request.GET.get('fields')
+    if not requested:
+        return default
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _values(queryset, fields, available):
+    # values() skips model instantiation, rows are renamed to the public field names afterwards
+    lookups = [available[name] for name in fields]
+    for row in queryset.values(*lookups):
+        yield {name: row[lookup] for name, lookup in zip(fields, lookups)}
+
+
+def _encode_cursor(value):
+    return base64.urlsafe_b64encode(str(value).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError("Invalid cursor")
+
+
+def _json_response(request, data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    etag = quote_etag(hashlib.md5(body, usedforsecurity=False).hexdigest())
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+class ApiView(View):
+    http_method_names = ['get', 'head', 'options']
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        except (Course.DoesNotExist, CourseLesson.DoesNotExist):
+            return JsonResponse({'error': "Not found"}, status=404)
+
+
+class CourseListApiView(ApiView):
+    def get(self, request, *args, **kwargs):
+        fields = _select_fields(request, COURSE_FIELDS, DEFAULT_COURSE_FIELDS)
+        try:
+            limit = min(max(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            raise ApiError("Invalid limit")
+
+        # same filters as CourseListView
+        queryset = Course.objects.order_by('id')
+        search_query = request.GET.get('q', None)
+        category = request.GET.get('cat', None)
+        difficulty = request.GET.get('dif', None)
+        if search_query:
+            queryset = queryset.filter(title__icontains=search_query)
+        if category:
+            try:
+                queryset = queryset.filter(category=int(category))
+            except ValueError:
+                raise ApiError("Invalid category")
+        if difficulty:
+            queryset = queryset.filter(difficulty=difficulty)
+
+        # keyset pagination stays fast at any depth, unlike OFFSET
+        cursor = request.GET.get('cursor')
+        if cursor:
+            queryset = queryset.filter(id__gt=_decode_cursor(cursor))
+
+        # the id is needed for the next cursor even when the client did not ask for it
+        lookup_fields = fields if 'id' in fields else fields + ['id']
+        rows = list(_values(queryset[:limit + 1], lookup_fields, COURSE_FIELDS))
+
+        next_url = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            params = request.GET.copy()
+            params['cursor'] = _encode_cursor(rows[-1]['id'])
+            next_url = f"{request.path}?{params.urlencode()}"
+        if 'id' not in fields:
+            for row in rows:
+                del row['id']
+
+        return _json_response(request, {'results': rows, 'next': next_url})
+
+
+class CourseOutlineApiView(ApiView):
+    def get(self, request, *args, **kwargs):
+        fields = _select_fields(request, COURSE_FIELDS, DEFAULT_COURSE_FIELDS + ['description', 'instructor_name'])
+        course = next(_values(Course.objects.filter(id=kwargs['pk']), fields, COURSE_FIELDS), None)
+        if course is None:
+            raise Course.DoesNotExist
+
+        lessons = CourseLesson.objects.filter(course_id=kwargs['pk']).order_by('id')
+        course['lessons'] = list(_values(lessons, DEFAULT_LESSON_FIELDS, LESSON_FIELDS))
+        return _json_response(request, course)
+
+
+class ProgressApiView(ApiView):
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            raise ApiError("Authentication required", status=401)
+
+        # correlated counts, joining both relations in one GROUP BY would multiply the rows
+        lessons_count = (
+            CourseLesson.objects.filter(course_id=OuterRef('course_id'))
+            .order_by().values('course_id').annotate(count=Count('id')).values('count')
+        )
+        attended_count = (
+            CourseAttendance.objects.filter(courseenrollment_id=OuterRef('id'))
+            .order_by().values('courseenrollment_id').annotate(count=Count('id')).values('count')
+        )
+        enrollments = (
+            CourseEnrollment.objects.filter(user=request.user)
+            .annotate(
+                lessons_count=Subquery(lessons_count, output_field=IntegerField()),
+                attended_count=Subquery(attended_count, output_field=IntegerField()),
+            )
+            .order_by('id')
+            .values('course_id', 'course__title', 'approved', 'entrolled_at', 'completed_date',
+                    'certificate_id', 'current_lesson_id', 'lessons_count', 'attended_count')
+        )
+
+        results = []
+        for row in enrollments:
+            lessons = row['lessons_count'] or 0
+            attended = row['attended_count'] or 0
+            results.append({
+                'course': row['course_id'],
+                'course_title': row['course__title'],
+                'approved': row['approved'],
+                'enrolled_at': row['entrolled_at'],
+                'current_lesson': row['current_lesson_id'],
+                'lessons': lessons,
+                'attended': attended,
+                'progress': 0 if lessons == 0 else round((attended / lessons) * 100, 2),
+                'completed': lessons == attended,
+                'completed_date': row['completed_date'],
+                'certificate_id': row['certificate_id'],
+            })
+
+        response = _json_response(request, {'results': results})
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Cookie'])
+        return response
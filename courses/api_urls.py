@@ -0,0 +1,8 @@
+from django.urls import path
+from courses.api import CourseListApiView, CourseOutlineApiView, ProgressApiView
+
+urlpatterns = [
+    path('courses/', CourseListApiView.as_view(), name='api_courses'),
+    path('courses/<int:pk>/', CourseOutlineApiView.as_view(), name='api_course'),
+    path('progress/', ProgressApiView.as_view(), name='api_progress'),
+]
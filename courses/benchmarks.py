@@ -0,0 +1,32 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.test import Client
+
+
+def make_client(username=None):
+    """A test client that passes ALLOWED_HOSTS, optionally logged in as an existing user"""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and not host.startswith('.') and host != '*']
+    client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost', secure=not settings.DEBUG)
+    if username:
+        try:
+            client.force_login(User.objects.get(username=username))
+        except User.DoesNotExist:
+            raise CommandError(f"User '{username}' does not exist")
+    return client
+
+
+def measure(client, url, iterations, **headers):
+    """Return (response, body bytes, median milliseconds) over the given number of requests"""
+    timings = []
+    response = None
+    body = b''
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = client.get(url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        timings.append((time.perf_counter() - start) * 1000)
+    return response, body, statistics.median(timings)
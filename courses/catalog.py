@@ -0,0 +1,153 @@
+import threading
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .models import CatalogVersion, Course, CourseCategory, CourseInstructor, COURSE_DIFFICULTY_OPTIONS
+
+
+CATALOG_VERSION_ID = 1
+DIFFICULTY_LABELS = dict(COURSE_DIFFICULTY_OPTIONS)
+BRIEF_DESCRIPTION_WORDS = 12
+
+
+class _Entry:
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    @property
+    def pk(self):
+        return self.id
+
+
+class CategoryEntry(_Entry):
+    __slots__ = ('id', 'title')
+
+    def __str__(self):
+        return self.title
+
+
+class InstructorEntry(_Entry):
+    __slots__ = ('id', 'name', 'photo', 'bio')
+
+    def __str__(self):
+        return self.name
+
+
+class CourseSummary(_Entry):
+    __slots__ = ('id', 'title', 'brief_description', 'category', 'instructor', 'difficulty',
+                 'duration_weeks', 'thumbnail', 'search_title')
+
+    def __str__(self):
+        return self.title
+
+    def get_difficulty_display(self):
+        return DIFFICULTY_LABELS.get(self.difficulty, self.difficulty)
+
+
+class CatalogSnapshot:
+    """
+    Read-only copy of the catalog reference data: categories, instructors and one summary row
+    per course, ordered by id. Each worker keeps one and rebuilds it when the version changes.
+    """
+    __slots__ = ('version', 'categories', 'categories_by_id', 'instructors_by_id', 'courses', 'courses_by_id',
+                 'courses_by_category', 'courses_by_difficulty')
+
+    def __init__(self, version, categories, instructors, courses):
+        self.version = version
+        self.categories = tuple(categories)
+        self.categories_by_id = {category.id: category for category in self.categories}
+        self.instructors_by_id = {instructor.id: instructor for instructor in instructors}
+        self.courses = tuple(courses)
+        self.courses_by_id = {course.id: course for course in self.courses}
+        by_category = {}
+        by_difficulty = {}
+        for course in self.courses:
+            if course.category is not None:
+                by_category.setdefault(course.category.id, []).append(course)
+            by_difficulty.setdefault(course.difficulty, []).append(course)
+        self.courses_by_category = {key: tuple(value) for key, value in by_category.items()}
+        self.courses_by_difficulty = {key: tuple(value) for key, value in by_difficulty.items()}
+
+    @classmethod
+    def load(cls, version):
+        categories = [CategoryEntry(id=id, title=title) for id, title in CourseCategory.objects.order_by('id').values_list('id', 'title')]
+        categories_by_id = {category.id: category for category in categories}
+        instructors = [
+            InstructorEntry(id=id, name=name, photo=photo, bio=bio)
+            for id, name, photo, bio in CourseInstructor.objects.order_by('id').values_list('id', 'name', 'photo', 'bio')
+        ]
+        instructors_by_id = {instructor.id: instructor for instructor in instructors}
+
+        rows = Course.objects.order_by('id').values_list(
+            'id', 'title', 'description', 'category_id', 'instructor_id', 'difficulty', 'duration_weeks', 'thumbnail'
+        ).iterator(chunk_size=2000)
+        courses = [
+            CourseSummary(
+                id=id, title=title, brief_description=Truncator(description).words(BRIEF_DESCRIPTION_WORDS),
+                # a row added while loading may point to a newer category, its version bump triggers the next rebuild
+                category=categories_by_id.get(category_id), instructor=instructors_by_id.get(instructor_id),
+                difficulty=difficulty, duration_weeks=duration_weeks, thumbnail=thumbnail, search_title=title.lower(),
+            )
+            for id, title, description, category_id, instructor_id, difficulty, duration_weeks, thumbnail in rows
+        ]
+        return cls(version, categories, instructors, courses)
+
+    def filter_courses(self, search=None, category=None, difficulty=None):
+        # start from a precomputed group, then narrow it down
+        if category is not None:
+            candidates = self.courses_by_category.get(category, ())
+            if difficulty:
+                candidates = [course for course in candidates if course.difficulty == difficulty]
+        elif difficulty:
+            candidates = self.courses_by_difficulty.get(difficulty, ())
+        else:
+            candidates = self.courses
+        if search:
+            search = search.lower()
+            candidates = [course for course in candidates if search in course.search_title]
+        return list(candidates)
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_catalog_version():
+    return CatalogVersion.objects.filter(id=CATALOG_VERSION_ID).values_list('version', flat=True).first() or 0
+
+
+def bump_catalog_version(using='default'):
+    global _snapshot
+    versions = CatalogVersion.objects.using(using)
+    updated = versions.filter(id=CATALOG_VERSION_ID).update(version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        versions.get_or_create(id=CATALOG_VERSION_ID, defaults={'version': 1})
+    # other workers notice the new version on their next request, this one drops its copy right away
+    _snapshot = None
+
+
+def get_catalog():
+    """Return this worker's snapshot, rebuilt first if the catalog version moved on. Costs one small query."""
+    global _snapshot
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        # another thread may have rebuilt it while this one waited
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = _snapshot = CatalogSnapshot.load(version)
+    return snapshot
@@ -76,6 +76,12 @@ def generate_certificate(response, user, course, enrollment):
     pdf_canvas.drawCentredString(width / 4, signature_y - 50, instructor_name)  # Instructor Name
     pdf_canvas.drawCentredString(3 * width / 4, signature_y - 50, f"{completion_date}")
 
+    # --- Certificate ID for public verification ---
+    if enrollment.certificate_id:
+        pdf_canvas.setFont("Helvetica", 9)
+        pdf_canvas.setFillColor(HexColor(color_gray_light))
+        pdf_canvas.drawCentredString(width / 2, margin + 12, f"Certificate ID: {enrollment.certificate_id}")
+
     # --- Finalize PDF ---
     pdf_canvas.showPage()
     pdf_canvas.save()
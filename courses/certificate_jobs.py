@@ -0,0 +1,76 @@
+import io
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .certificate import generate_certificate
+from .models import CertificateJob
+
+
+logger = logging.getLogger(__name__)
+
+
+def requeue_stale_jobs():
+    """Put back jobs left running by a worker that died, returns how many"""
+    timeout = getattr(settings, 'CERTIFICATE_JOB_TIMEOUT', 300)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return CertificateJob.objects.filter(status=CertificateJob.RUNNING, started_at__lt=cutoff).update(status=CertificateJob.PENDING)
+
+
+def claim_jobs(batch_size=20):
+    """Mark a batch of pending jobs as running and return their ids"""
+    with transaction.atomic():
+        pending = CertificateJob.objects.filter(status=CertificateJob.PENDING).order_by('id')
+        if db_connection.features.has_select_for_update_skip_locked:
+            # several workers can share the queue without picking the same jobs
+            pending = pending.select_for_update(skip_locked=True)
+        ids = list(pending.values_list('id', flat=True)[:batch_size])
+        if ids:
+            CertificateJob.objects.filter(id__in=ids).update(status=CertificateJob.RUNNING, started_at=timezone.now())
+    return ids
+
+
+def render_job(job_id, max_attempts=3):
+    """Render the certificate of one claimed job, returns True when the file is ready"""
+    job = CertificateJob.objects.select_related('enrollment__user', 'enrollment__course__instructor').get(id=job_id)
+    enrollment = job.enrollment
+    job.attempts += 1
+    try:
+        buffer = io.BytesIO()
+        generate_certificate(buffer, enrollment.user, enrollment.course, enrollment)
+        job.file.save(f"{enrollment.certificate_id or enrollment.id}.pdf", ContentFile(buffer.getvalue()), save=False)
+    except Exception as e:
+        logger.exception("Rendering certificate job %s failed", job_id)
+        job.last_error = str(e)
+        job.status = CertificateJob.FAILED if job.attempts >= max_attempts else CertificateJob.PENDING
+        job.save(update_fields=['attempts', 'last_error', 'status'])
+        return False
+
+    job.status = CertificateJob.READY
+    job.last_error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['attempts', 'last_error', 'status', 'file', 'finished_at'])
+    return True
+
+
+def process_batch(batch_size=20, max_attempts=3, executor=None):
+    """
+    Claim one batch of pending jobs and render them, in the executor's processes when one is given.
+
+    Returns (rendered, failed) counts for the batch.
+    """
+    requeue_stale_jobs()
+    ids = claim_jobs(batch_size)
+    if not ids:
+        return 0, 0
+
+    if executor is None:
+        results = [render_job(job_id, max_attempts) for job_id in ids]
+    else:
+        results = list(executor.map(render_job, ids, [max_attempts] * len(ids)))
+    rendered = sum(results)
+    return rendered, len(results) - rendered
@@ -0,0 +1,114 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, content_disposition_header, quote_etag
+
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _parse_range(header, size):
+    """Return (start, end) for a single byte range, None to send the whole file, or False if unsatisfiable"""
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        # multiple or malformed ranges, a full response is always allowed
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _headers(response, filename, content_type, etag, last_modified):
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = content_disposition_header(False, filename)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # the file is only for enrolled learners, shared caches must not keep it
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+def serve_protected_file(request, file):
+    """
+    Send a FieldFile that already passed the permission checks.
+
+    Behind nginx (LESSON_FILES_ACCEL_PREFIX set) the transfer is handed off with X-Accel-Redirect,
+    otherwise the file is streamed from disk in chunks with Range and conditional request support.
+    """
+    filename = os.path.basename(file.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    accel_prefix = getattr(settings, 'LESSON_FILES_ACCEL_PREFIX', None)
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        # nginx decodes the uri, names with spaces or non-ascii characters would not survive as raw header bytes
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + quote(file.name.lstrip('/'))
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+        response['Cache-Control'] = 'private, max-age=3600'
+        return response
+
+    path = file.path
+    stat = os.stat(path)
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f"{last_modified:x}-{size:x}")
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return _headers(response, filename, content_type, etag, last_modified)
+
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header:
+        # a stale If-Range means the client's partial copy is outdated, so send everything
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if if_range is None or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+            byte_range = _parse_range(range_header, size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return _headers(response, filename, content_type, etag, last_modified)
+
+    if byte_range is None:
+        # FileResponse lets the server use wsgi.file_wrapper (sendfile) for whole files
+        response = FileResponse(open(path, 'rb'), content_type=content_type, filename=filename)
+        response.block_size = CHUNK_SIZE
+        return _headers(response, filename, content_type, etag, last_modified)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_read_range(path, start, length), status=206)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return _headers(response, filename, content_type, etag, last_modified)
@@ -0,0 +1,203 @@
+import json
+from contextlib import contextmanager
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import CourseCategory, CourseInstructor, Course, CourseLesson
+
+
+# parents first, so foreign keys can always be resolved from the id maps
+CATALOG_MODELS = [CourseCategory, CourseInstructor, Course, CourseLesson]
+CATALOG_LABELS = {model._meta.label_lower: model for model in CATALOG_MODELS}
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class FixtureError(Exception):
+    pass
+
+
+def iter_json_objects(stream, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yield the objects of a JSON array or a JSON lines stream one at a time,
+    only ever holding the current object and one read chunk in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    in_array = None
+
+    while True:
+        # skip separators between objects
+        while position < len(buffer) and (buffer[position].isspace() or (in_array and buffer[position] == ',')):
+            position += 1
+
+        if in_array is None and position < len(buffer):
+            in_array = buffer[position] == '['
+            if in_array:
+                position += 1
+                continue
+
+        if in_array and buffer.startswith(']', position):
+            return
+
+        if position < len(buffer):
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise FixtureError("Invalid or truncated JSON fixture")
+            else:
+                # a value that ends exactly at the buffer edge might continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield obj
+                    position = end
+                    continue
+
+        if eof:
+            if in_array:
+                raise FixtureError("Unterminated JSON array")
+            return
+
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _auto_now_add_fields(model):
+    return [field for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+
+
+@contextmanager
+def _keep_creation_times(model):
+    """Insert the creation times set by _build() instead of letting the fields stamp the current time"""
+    # the flag lives on the shared field, imports run from a management command with no other threads saving
+    fields = _auto_now_add_fields(model)
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class CatalogImporter:
+    def __init__(self, using='default', batch_size=DEFAULT_BATCH_SIZE):
+        self.using = using
+        self.batch_size = batch_size
+        self.connection = connections[using]
+        # source pk -> database pk, only kept for models that other catalog rows point to
+        self.id_maps = {CourseCategory: {}, CourseInstructor: {}, Course: {}}
+        self.pending = {model: [] for model in CATALOG_MODELS}
+        self.counts = {model._meta.label_lower: 0 for model in CATALOG_MODELS}
+
+    def _build(self, model, record):
+        instance = model()
+        # creation times come from the fixture, rows without one are stamped with the import time
+        for field in _auto_now_add_fields(model):
+            setattr(instance, field.attname, timezone.now())
+        for name, value in record.get('fields', {}).items():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise FixtureError(f"{model._meta.label_lower} has no field named '{name}'")
+
+            if field.many_to_one:
+                target = field.related_model
+                key = None if value is None else str(value)
+                if key is not None and key not in self.id_maps[target]:
+                    # the parent may still be waiting in a pending batch
+                    self._flush_parents(model)
+                if key is not None and key not in self.id_maps[target]:
+                    raise FixtureError(f"{model._meta.label_lower} {record.get('pk')} references unknown {target._meta.label_lower} {value}")
+                setattr(instance, field.attname, None if key is None else self.id_maps[target][key])
+            else:
+                setattr(instance, field.attname, field.to_python(value))
+        return instance
+
+    def _flush_parents(self, model):
+        for parent in CATALOG_MODELS[:CATALOG_MODELS.index(model)]:
+            self._flush(parent)
+
+    def _flush(self, model):
+        batch = self.pending[model]
+        if not batch:
+            return
+        self.pending[model] = []
+
+        with transaction.atomic(using=self.using), _keep_creation_times(model):
+            if model not in self.id_maps:
+                model.objects.using(self.using).bulk_create([instance for _, instance in batch])
+            elif self.connection.features.can_return_rows_from_bulk_insert:
+                model.objects.using(self.using).bulk_create([instance for _, instance in batch])
+                self.id_maps[model].update((str(source_pk), instance.pk) for source_pk, instance in batch)
+            else:
+                # without RETURNING support there is no other way to learn the new primary keys
+                for source_pk, instance in batch:
+                    instance.save(using=self.using)
+                    self.id_maps[model][str(source_pk)] = instance.pk
+        self.counts[model._meta.label_lower] += len(batch)
+
+    def add(self, record):
+        model = CATALOG_LABELS.get(str(record.get('model', '')).lower())
+        if model is None:
+            raise FixtureError(f"Unsupported model '{record.get('model')}'")
+
+        self.pending[model].append((record.get('pk'), self._build(model, record)))
+        if len(self.pending[model]) >= self.batch_size:
+            self._flush_parents(model)
+            self._flush(model)
+
+    def finish(self):
+        for model in CATALOG_MODELS:
+            self._flush(model)
+        return self.counts
+
+
+def import_catalog(stream, using='default', batch_size=DEFAULT_BATCH_SIZE):
+    importer = CatalogImporter(using=using, batch_size=batch_size)
+    try:
+        for record in iter_json_objects(stream):
+            importer.add(record)
+        return importer.finish()
+    finally:
+        # bulk inserts skip the model signals, and batches committed before an error are live too
+        bump_catalog_version(using)
+
+
+def _iter_records(model, using, batch_size):
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    columns = ['pk'] + [field.attname for field in fields]
+    rows = model.objects.using(using).order_by('pk').values_list(*columns).iterator(chunk_size=batch_size)
+    for row in rows:
+        # plain tuples from values_list(), no model instances are built for the export
+        values = {field.name: value for field, value in zip(fields, row[1:])}
+        yield {'model': model._meta.label_lower, 'pk': row[0], 'fields': values}
+
+
+def export_catalog(stream, using='default', batch_size=DEFAULT_BATCH_SIZE, jsonl=False):
+    counts = {}
+    first = True
+    if not jsonl:
+        stream.write('[')
+    for model in CATALOG_MODELS:
+        counts[model._meta.label_lower] = 0
+        for record in _iter_records(model, using, batch_size):
+            data = json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+            if jsonl:
+                stream.write(data + '\n')
+            else:
+                stream.write(('\n' if first else ',\n') + data)
+            first = False
+            counts[model._meta.label_lower] += 1
+    if not jsonl:
+        stream.write('\n]\n')
+    return counts
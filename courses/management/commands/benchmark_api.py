@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from courses.benchmarks import make_client, measure
+from courses.models import Course
+
+
+class Command(BaseCommand):
+    help = "Compare response size and latency of the JSON API with the equivalent HTML pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--username', help="Existing user for the progress comparison")
+
+    def handle(self, *args, **options):
+        client = make_client(options['username'])
+        course = Course.objects.order_by('id').first()
+
+        routes = [('catalog', reverse('courses'), reverse('api_courses'))]
+        if course is not None:
+            routes.append(('course', reverse('course_detail', args=[course.pk]), reverse('api_course', args=[course.pk])))
+        if options['username']:
+            routes.append(('progress', reverse('home'), reverse('api_progress')))
+
+        self.stdout.write(f"{'route':<10}{'html bytes':>12}{'json bytes':>12}{'html ms':>10}{'json ms':>10}")
+        for name, html_url, json_url in routes:
+            _, html, html_ms = measure(client, html_url, options['iterations'])
+            _, data, json_ms = measure(client, json_url, options['iterations'])
+            self.stdout.write(f"{name:<10}{len(html):>12}{len(data):>12}{html_ms:>10.2f}{json_ms:>10.2f}")
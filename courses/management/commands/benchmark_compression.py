@@ -0,0 +1,52 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from courses.benchmarks import make_client, measure
+from courses.models import Course
+from elearner.middleware.compression import brotli, compress_bytes
+
+
+class Command(BaseCommand):
+    help = "Measure bytes saved and CPU time spent compressing the dynamic pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--username', help="Existing user, adds the signed-in home and classroom pages")
+
+    def handle(self, *args, **options):
+        client = make_client(options['username'])
+        routes = [('home', reverse('home')), ('courses', reverse('courses')), ('faq', reverse('faq'))]
+        course = Course.objects.order_by('id').first()
+        if course is not None:
+            routes.append(('course_detail', reverse('course_detail', args=[course.pk])))
+            lesson = course.lessons.order_by('id').first()
+            if options['username'] and lesson is not None:
+                routes.append(('classroom', reverse('classroom', kwargs={'course': course.pk, 'lesson': lesson.pk})))
+
+        encodings = [('gzip', settings.COMPRESSION_GZIP_LEVEL)]
+        if brotli is not None:
+            encodings.insert(0, ('br', settings.COMPRESSION_BROTLI_QUALITY))
+
+        header = f"{'route':<15}{'raw bytes':>11}"
+        for encoding, level in encodings:
+            header += f"{f'{encoding}-{level} bytes':>16}{'saved':>8}{'cpu ms':>9}"
+        self.stdout.write(header)
+
+        for name, url in routes:
+            # fetch uncompressed and time the codecs on the same body, so page rendering is not counted
+            _, body, _ = measure(client, url, 1)
+            line = f"{name:<15}{len(body):>11}"
+            for encoding, level in encodings:
+                start = time.perf_counter()
+                for _ in range(options['iterations']):
+                    if encoding == 'br':
+                        compressed = compress_bytes(body, 'br', brotli_quality=level)
+                    else:
+                        compressed = compress_bytes(body, 'gzip', gzip_level=level)
+                cpu_ms = (time.perf_counter() - start) * 1000 / options['iterations']
+                saved = 100 - len(compressed) * 100 / max(len(body), 1)
+                line += f"{len(compressed):>16}{saved:>7.1f}%{cpu_ms:>9.3f}"
+            self.stdout.write(line)
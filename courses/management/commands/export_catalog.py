@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from courses.fixtures import export_catalog, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Stream the course catalog out as a JSON or JSON lines fixture"
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help="Output file, defaults to stdout")
+        parser.add_argument('--jsonl', action='store_true', help="Write one object per line")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            export_catalog(self.stdout, options['database'], options['batch_size'], options['jsonl'])
+            return
+
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            counts = export_catalog(stream, options['database'], options['batch_size'], options['jsonl'])
+        self.stdout.write(self.style.SUCCESS(f"Exported {sum(counts.values())} objects to {options['output']}"))
@@ -0,0 +1,239 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from courses.catalog import bump_catalog_version
+from courses.models import (
+    CourseCategory, CourseInstructor, Course, CourseLesson, CourseEnrollment, CourseAttendance,
+    COURSE_DIFFICULTY_OPTIONS
+)
+
+
+WORDS = (
+    "python data web cloud mobile machine learning design patterns security testing advanced "
+    "introduction practical modern applied fundamentals deep systems networks analytics apis"
+).split()
+# chance that a learner who attended a lesson goes on to the next one
+LESSON_RETENTION = 0.85
+APPROVAL_RATE = 0.9
+# share of approved learners that attend at least the first lesson
+START_RATE = 0.9
+HISTORY_DAYS = 365
+
+
+def _split(total, parts):
+    """Spread total over parts as evenly as possible"""
+    base, remainder = divmod(total, parts)
+    for i in range(parts):
+        yield base + (1 if i < remainder else 0)
+
+
+def _id_range(objects):
+    # a bulk insert on a quiet database hands out consecutive ids, a range keeps them at constant memory
+    ids = [obj.pk for obj in objects]
+    if not ids:
+        return ()
+    compact = range(ids[0], ids[-1] + 1)
+    return compact if len(compact) == len(ids) else tuple(ids)
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic production-sized dataset for performance testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=1000)
+        parser.add_argument('--instructors', type=int, default=5000)
+        parser.add_argument('--courses', type=int, default=100000)
+        parser.add_argument('--lessons', type=int, default=2000000)
+        parser.add_argument('--users', type=int, default=500000)
+        parser.add_argument('--enrollments', type=int, default=5000000)
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiply every count, e.g. 0.01 for a quick run")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='synthetic', help="Prefix of generated usernames")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.timings = []
+
+        counts = {}
+        for name in ('categories', 'instructors', 'courses', 'lessons', 'users', 'enrollments'):
+            counts[name] = max(1, int(options[name] * options['scale']))
+        if counts['enrollments'] > counts['users'] * counts['courses']:
+            raise CommandError("Not enough users and courses for that many unique enrollments")
+        if User.objects.filter(username__startswith=f"{self.prefix}_").exists():
+            raise CommandError(f"Users with the prefix '{self.prefix}_' already exist, pick another --prefix")
+
+        categories = self._timed('categories', self._create_categories, counts['categories'])
+        instructors = self._timed('instructors', self._create_instructors, counts['instructors'])
+        courses = self._timed('courses', self._create_courses, counts['courses'], categories, instructors)
+        lessons = self._timed('lessons', self._create_lessons, counts['lessons'], courses)
+        users = self._timed('users', self._create_users, counts['users'])
+        self._timed('enrollments', self._create_enrollments, counts['enrollments'], users, courses, lessons)
+        # bulk inserts skip the model signals
+        bump_catalog_version()
+        # attendance rows are inserted alongside their enrollments, report them on their own line
+        name, rows, seconds = self.timings.pop()
+        self.timings.append((name, rows, seconds - self.attendance_seconds))
+        self.timings.append(('attendance', self.attendance_rows, self.attendance_seconds))
+
+        total = 0
+        self.stdout.write(f"{'table':<14}{'rows':>12}{'seconds':>10}{'rows/s':>12}")
+        for name, rows, seconds in self.timings:
+            total += seconds
+            self.stdout.write(f"{name:<14}{rows:>12}{seconds:>10.2f}{rows / max(seconds, 1e-9):>12.0f}")
+        self.stdout.write(self.style.SUCCESS(f"Generated dataset with seed {options['seed']} in {total:.2f}s"))
+
+    def _timed(self, name, function, *args):
+        start = time.perf_counter()
+        result, rows = function(*args)
+        self.timings.append((name, rows, time.perf_counter() - start))
+        return result
+
+    def _bulk_create(self, model, objects):
+        with transaction.atomic():
+            return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def _title(self, words=3):
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).title()
+
+    def _create_categories(self, count):
+        objects = self._bulk_create(CourseCategory, [CourseCategory(title=f"{self._title(2)} {i}") for i in range(count)])
+        return _id_range(objects), count
+
+    def _create_instructors(self, count):
+        objects = self._bulk_create(CourseInstructor, [
+            CourseInstructor(name=f"Instructor {i}", photo='instructors/alan_mitchell.jpg', bio=f"Teaches {self._title(4)}.")
+            for i in range(count)
+        ])
+        return _id_range(objects), count
+
+    def _create_courses(self, count, categories, instructors):
+        ids = []
+        difficulties = [key for key, _ in COURSE_DIFFICULTY_OPTIONS]
+        for start in range(0, count, self.batch_size):
+            objects = self._bulk_create(Course, [
+                Course(
+                    title=f"{self._title()} {i}",
+                    description=" ".join(self.rng.choice(WORDS) for _ in range(40)),
+                    category_id=self.rng.choice(categories),
+                    instructor_id=self.rng.choice(instructors),
+                    difficulty=self.rng.choice(difficulties),
+                    duration_weeks=self.rng.randint(2, 16),
+                    thumbnail='course_thumbnails/python_intro.webp',
+                )
+                for i in range(start, min(start + self.batch_size, count))
+            ])
+            ids.extend(obj.pk for obj in objects)
+        return ids, count
+
+    def _create_lessons(self, count, courses):
+        # ids of each course's lessons, in lesson order
+        lessons = []
+        pending = []
+        sizes = []
+
+        def flush():
+            objects = iter(self._bulk_create(CourseLesson, pending))
+            for size in sizes:
+                lessons.append(_id_range([next(objects) for _ in range(size)]))
+            pending.clear()
+            sizes.clear()
+
+        for course_id, size in zip(courses, _split(count, len(courses))):
+            for i in range(size):
+                pending.append(CourseLesson(
+                    course_id=course_id,
+                    title=f"Lesson {i + 1}: {self._title()}",
+                    youtube_link='https://www.youtube.com/embed/dQw4w9WgXcQ',
+                    description=" ".join(self.rng.choice(WORDS) for _ in range(60)),
+                    brief=self._title(8),
+                ))
+            sizes.append(size)
+            if len(pending) >= self.batch_size:
+                flush()
+        flush()
+        return lessons, count
+
+    def _create_users(self, count):
+        # hashing once keeps user creation fast, every generated user shares the same password
+        password = make_password('password123')
+        ids = []
+        for start in range(0, count, self.batch_size):
+            objects = self._bulk_create(User, [
+                User(username=f"{self.prefix}_{i}", email=f"{self.prefix}_{i}@example.com", password=password,
+                     first_name=self.rng.choice(WORDS).title(), last_name=self.rng.choice(WORDS).title())
+                for i in range(start, min(start + self.batch_size, count))
+            ])
+            ids.extend(obj.pk for obj in objects)
+        return ids, count
+
+    def _create_enrollments(self, count, users, courses, lessons):
+        now = timezone.now()
+        enrollments = []
+        plans = []
+        self.attendance_rows = 0
+        self.attendance_seconds = 0.0
+
+        def flush():
+            created = self._bulk_create(CourseEnrollment, enrollments)
+            attendances = []
+            for enrollment, (lesson_ids, attended_at) in zip(created, plans):
+                for lesson_id, moment in zip(lesson_ids, attended_at):
+                    attendances.append(CourseAttendance(
+                        courseenrollment_id=enrollment.pk, courselesson_id=lesson_id, attended_at=moment
+                    ))
+            start = time.perf_counter()
+            self._bulk_create(CourseAttendance, attendances)
+            self.attendance_seconds += time.perf_counter() - start
+            self.attendance_rows += len(attendances)
+            enrollments.clear()
+            plans.clear()
+
+        for user_id, size in zip(users, _split(count, len(users))):
+            if size * 2 > len(courses):
+                chosen = set(self.rng.sample(range(len(courses)), size))
+            else:
+                chosen = set()
+                while len(chosen) < size:
+                    # squaring skews enrollments towards a minority of popular courses
+                    chosen.add(int(len(courses) * self.rng.random() ** 2))
+
+            for course_index in sorted(chosen):
+                course_lessons = lessons[course_index]
+                approved = self.rng.random() < APPROVAL_RATE
+                attended = 0
+                if approved and course_lessons and self.rng.random() < START_RATE:
+                    attended = 1
+                    while attended < len(course_lessons) and self.rng.random() < LESSON_RETENTION:
+                        attended += 1
+
+                moment = now - timedelta(days=self.rng.uniform(0, HISTORY_DAYS))
+                attended_at = []
+                for _ in range(attended):
+                    moment = min(moment + timedelta(hours=self.rng.uniform(1, 72)), now)
+                    attended_at.append(moment)
+
+                completed = attended > 0 and attended == len(course_lessons)
+                enrollments.append(CourseEnrollment(
+                    course_id=courses[course_index],
+                    user_id=user_id,
+                    approved=approved,
+                    current_lesson_id=course_lessons[attended] if 0 < attended < len(course_lessons) else None,
+                    completed_date=attended_at[-1] if completed else None,
+                    certificate_id=f"{self.rng.getrandbits(128):032x}" if completed else None,
+                ))
+                plans.append((course_lessons[:attended], attended_at))
+
+            if len(enrollments) >= self.batch_size:
+                flush()
+        flush()
+        return None, count
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.fixtures import import_catalog, FixtureError, DEFAULT_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Stream a JSON or JSON lines catalog fixture into the database using batched bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', help="Path to a .json or .jsonl file, or - for stdin")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be a positive number")
+
+        try:
+            if options['fixture'] == '-':
+                counts = import_catalog(sys.stdin, options['database'], options['batch_size'])
+            else:
+                with open(options['fixture'], encoding='utf-8') as stream:
+                    counts = import_catalog(stream, options['database'], options['batch_size'])
+        except (OSError, FixtureError) as e:
+            raise CommandError(e)
+
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {sum(counts.values())} objects"))
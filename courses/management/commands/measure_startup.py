@@ -0,0 +1,62 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# runs in a bare interpreter, so the import of the WSGI app includes django.setup() like in a worker
+CHILD_SCRIPT = """
+import json, sys, time
+mode, url = sys.argv[1], sys.argv[2]
+
+start = time.perf_counter()
+from elearner.wsgi import application
+load = time.perf_counter() - start
+
+warmup = 0
+if mode == 'warm':
+    from elearner.warmup import warm_up
+    start = time.perf_counter()
+    warm_up()
+    warmup = time.perf_counter() - start
+
+from courses.benchmarks import make_client
+client = make_client()
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    client.get(url)
+    timings.append(time.perf_counter() - start)
+
+print(json.dumps({'load': load * 1000, 'warmup': warmup * 1000, 'first': timings[0] * 1000, 'second': timings[1] * 1000}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure app load time and first request latency of a fresh process, with and without warm-up"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--url', default='/courses/')
+
+    def handle(self, *args, **options):
+        results = {'cold': [], 'warm': []}
+        for _ in range(options['runs']):
+            for mode in results:
+                output = subprocess.run(
+                    [sys.executable, '-c', CHILD_SCRIPT, mode, options['url']],
+                    cwd=settings.BASE_DIR, capture_output=True, text=True,
+                )
+                if output.returncode != 0:
+                    raise CommandError(output.stderr)
+                results[mode].append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+        self.stdout.write(f"{'mode':<6}{'load ms':>10}{'warm-up ms':>12}{'1st request ms':>16}{'2nd request ms':>16}")
+        for mode, runs in results.items():
+            median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+            self.stdout.write(
+                f"{mode:<6}{median['load']:>10.1f}{median['warmup']:>12.1f}{median['first']:>16.1f}{median['second']:>16.1f}"
+            )
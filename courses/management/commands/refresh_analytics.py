@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from courses.analytics import refresh_rollups, ROLLUP_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Fold new attendance and completion events into the daily analytics rollups"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        result = refresh_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {result['attendances']} attendance events and {result['completions']} completions"
+        ))
@@ -0,0 +1,54 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.certificate_jobs import process_batch
+from courses.workers import INHERITED_SETTINGS, init_worker
+
+
+class Command(BaseCommand):
+    help = "Render queued course certificates in a local pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=2, help="Rendering processes, 1 renders in this process")
+        parser.add_argument('--max-attempts', type=int, default=3)
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new jobs")
+        parser.add_argument('--interval', type=float, default=2, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        executor = None
+        if options['workers'] > 1:
+            executor = ProcessPoolExecutor(
+                max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker, initargs=({name: getattr(settings, name) for name in INHERITED_SETTINGS},)
+            )
+
+        total_rendered = total_failed = 0
+        try:
+            while True:
+                try:
+                    rendered, failed = process_batch(options['batch_size'], options['max_attempts'], executor)
+                except Exception as e:
+                    if not options['loop']:
+                        raise
+                    # a worker that exits on a database hiccup would leave the queue undrained
+                    self.stderr.write(f"Rendering failed: {e}")
+                    rendered, failed = 0, 0
+
+                total_rendered += rendered
+                total_failed += failed
+                if rendered or failed:
+                    self.stdout.write(f"Rendered {rendered}, failed {failed}")
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f"Certificate queue drained: {total_rendered} rendered, {total_failed} failed"))
@@ -0,0 +1,95 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_attended_at(apps, schema_editor):
+    # attendance was never timestamped, the enrollment date is the best lower bound we have
+    CourseAttendance = apps.get_model('courses', 'CourseAttendance')
+    CourseEnrollment = apps.get_model('courses', 'CourseEnrollment')
+    enrolled_at = CourseEnrollment.objects.filter(pk=models.OuterRef('courseenrollment_id')).values('entrolled_at')[:1]
+    CourseAttendance.objects.update(attended_at=models.Subquery(enrolled_at))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0001_initial'),
+    ]
+
+    operations = [
+        # turn the auto-created attended_lessons table into an explicit through model without touching the data
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='CourseAttendance',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('courseenrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.courseenrollment')),
+                        ('courselesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.courselesson')),
+                    ],
+                    options={
+                        'db_table': 'courses_courseenrollment_attended_lessons',
+                        'unique_together': {('courseenrollment', 'courselesson')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='courseenrollment',
+                    name='attended_lessons',
+                    field=models.ManyToManyField(related_name='attended_by', through='courses.CourseAttendance', to='courses.courselesson'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='courseattendance',
+            name='attended_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_attended_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='courseenrollment',
+            name='completed_date',
+            field=models.DateTimeField(db_index=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='AnalyticsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attendances', models.PositiveIntegerField(default=0)),
+                ('active_learners', models.PositiveIntegerField(default=0)),
+                ('completions', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.course')),
+            ],
+            options={
+                'verbose_name_plural': 'Course Daily Stats',
+                'indexes': [models.Index(fields=['day', 'course'], name='course_daily_day_idx')],
+                'unique_together': {('course', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('attendances', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_daily_stats', to='courses.course')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='courses.courselesson')),
+            ],
+            options={
+                'verbose_name_plural': 'Lesson Daily Stats',
+                'indexes': [models.Index(fields=['course', 'day'], name='lesson_daily_course_day_idx')],
+                'unique_together': {('lesson', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_courseattendance_analytics'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='title',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-19 10:50
+
+import uuid
+from django.db import migrations, models
+
+
+def assign_certificate_ids(apps, schema_editor):
+    # complete_lesson already generated ids for finished courses but they were never stored
+    CourseEnrollment = apps.get_model('courses', 'CourseEnrollment')
+    completed = CourseEnrollment.objects.filter(completed_date__isnull=False, certificate_id__isnull=True)
+    for enrollment in completed.only('id').iterator():
+        CourseEnrollment.objects.filter(id=enrollment.id).update(certificate_id=uuid.uuid4().hex)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_title_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseenrollment',
+            name='certificate_id',
+            field=models.CharField(editable=False, max_length=32, null=True, unique=True),
+        ),
+        migrations.RunPython(assign_certificate_ids, migrations.RunPython.noop),
+    ]
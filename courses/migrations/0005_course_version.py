@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_enrollment_certificate_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
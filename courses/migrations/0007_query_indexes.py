@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_catalogversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['category', 'difficulty', 'id'], name='course_category_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['difficulty', 'id'], name='course_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courseenrollment',
+            index=models.Index(fields=['user', 'course'], name='enrollment_user_course_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courseenrollment',
+            index=models.Index(condition=models.Q(('approved', False)), fields=['id'], name='enrollment_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courselesson',
+            index=models.Index(fields=['course', 'id'], name='lesson_course_id_idx'),
+        ),
+    ]
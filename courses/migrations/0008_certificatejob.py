@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PE', 'Pending'), ('RU', 'Running'), ('RE', 'Ready'), ('FA', 'Failed')], default='PE', max_length=2)),
+                ('file', models.FileField(blank=True, upload_to='certificates/')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('enrollment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='certificate_job', to='courses.courseenrollment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'id'], name='certificate_job_status_idx')],
+            },
+        ),
+    ]
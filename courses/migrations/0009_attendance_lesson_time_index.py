@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_certificatejob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='courseattendance',
+            index=models.Index(fields=['courselesson', 'attended_at'], name='attendance_lesson_time_idx'),
+        ),
+    ]
@@ -42,6 +42,8 @@ class CourseManager(models.Manager):
             enrollment.completed_date = timezone.now()
             enrollment.certificate_id = uuid.uuid4().hex
             enrollment.save()
+            # rendered by the render_certificates worker, not inside the download request
+            CertificateJob.objects.get_or_create(enrollment=enrollment)
 
     def get_lesson(self, user, course_id, lesson_id):
         course = Course.objects.get(id=course_id)
@@ -50,6 +52,24 @@ class CourseManager(models.Manager):
         
         lesson = course.lessons.get(id=lesson_id)
         return lesson
+
+    def get_classroom_lesson(self, user, course_id, lesson_id):
+        """Return the lesson (annotated with its course version) and the ids of the lessons the learner attended"""
+        if not user.is_authenticated:
+            raise Course.DoesNotExist
+
+        # the access check rides along in the same query, both conditions apply to one enrollment row
+        lesson = (
+            CourseLesson.objects
+            .filter(id=lesson_id, course_id=course_id, course__enrollments__user=user, course__enrollments__approved=True)
+            .annotate(course_version=models.F('course__version'), enrollment_id=models.F('course__enrollments__id'))
+            .first()
+        )
+        if lesson is None:
+            raise CourseLesson.DoesNotExist
+
+        attended = CourseAttendance.objects.filter(courseenrollment_id=lesson.enrollment_id)
+        return lesson, set(attended.values_list('courselesson_id', flat=True))
         
     def get_user_courses(self, user):
         enrollments = CourseEnrollment.objects.filter(user=user).all()
@@ -91,7 +111,7 @@ class CourseInstructor(models.Model):
 
 
 class Course(models.Model):
-    title = models.CharField(max_length=255)
+    title = models.CharField(max_length=255, db_index=True)
     description = models.TextField()
     category = models.ForeignKey(CourseCategory, related_name='courses', on_delete=models.CASCADE)
     difficulty = models.CharField(max_length=5, choices=COURSE_DIFFICULTY_OPTIONS)
@@ -99,9 +119,18 @@ class Course(models.Model):
     instructor = models.ForeignKey(CourseInstructor, on_delete=models.CASCADE, related_name='instructed_courses')
     thumbnail = models.ImageField(upload_to='course_thumbnails/')
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped on every change of the course, its lessons or its category, see courses.signals
+    version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = CourseManager()
 
+    class Meta:
+        indexes = [
+            # catalog filters, the id keeps the API's keyset pagination in index order
+            models.Index(fields=['category', 'difficulty', 'id'], name='course_category_difficulty_idx'),
+            models.Index(fields=['difficulty', 'id'], name='course_difficulty_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -127,6 +156,10 @@ class CourseLesson(models.Model):
     brief = models.CharField(max_length=300)
     file = models.FileField(upload_to='lessons/', null=True, blank=True)
 
+    class Meta:
+        # next/first lesson lookups filter on the course and walk the ids in order
+        indexes = [models.Index(fields=['course', 'id'], name='lesson_course_id_idx')]
+
     def __str__(self):
         return self.title
     
@@ -140,8 +173,17 @@ class CourseEnrollment(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='entrollments')
     approved = models.BooleanField(default=False)
     entrolled_at = models.DateTimeField(auto_now_add=True)
-    attended_lessons = models.ManyToManyField(CourseLesson, related_name='attended_by')
-    completed_date = models.DateTimeField(null=True, editable=False)
+    attended_lessons = models.ManyToManyField(CourseLesson, related_name='attended_by', through='CourseAttendance')
+    completed_date = models.DateTimeField(null=True, editable=False, db_index=True)
+    certificate_id = models.CharField(max_length=32, unique=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'course'], name='enrollment_user_course_idx'),
+            # enrollments waiting for approval in the admin, listed newest first. approved ones are the
+            # large majority, reading the table in id order finds a page of them right away
+            models.Index(fields=['id'], condition=models.Q(approved=False), name='enrollment_pending_idx'),
+        ]
 
     def __str__(self):
         return f"{self.course.title} | {self.user.username}"
@@ -165,4 +207,98 @@ class CourseEnrollment(models.Model):
     @property
     def can_download_certificate(self):
         return self.approved and self.is_completed
-    
+
+
+class CourseAttendance(models.Model):
+    # keeps the table of the former auto-created m2m, so existing attendance rows are preserved
+    courseenrollment = models.ForeignKey(CourseEnrollment, on_delete=models.CASCADE)
+    courselesson = models.ForeignKey(CourseLesson, on_delete=models.CASCADE)
+    attended_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'courses_courseenrollment_attended_lessons'
+        unique_together = ('courseenrollment', 'courselesson')
+        # the analytics rollup recounts the learners of a course's lessons within one day
+        indexes = [models.Index(fields=['courselesson', 'attended_at'], name='attendance_lesson_time_idx')]
+
+    def __str__(self):
+        return f"{self.courseenrollment_id} | {self.courselesson_id}"
+
+
+class CourseDailyStats(models.Model):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    attendances = models.PositiveIntegerField(default=0)
+    active_learners = models.PositiveIntegerField(default=0)
+    completions = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Course Daily Stats"
+        unique_together = ('course', 'day')
+        indexes = [models.Index(fields=['day', 'course'], name='course_daily_day_idx')]
+
+    def __str__(self):
+        return f"{self.course_id} | {self.day}"
+
+
+class LessonDailyStats(models.Model):
+    lesson = models.ForeignKey(CourseLesson, on_delete=models.CASCADE, related_name='daily_stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lesson_daily_stats')
+    day = models.DateField()
+    attendances = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Lesson Daily Stats"
+        unique_together = ('lesson', 'day')
+        indexes = [models.Index(fields=['course', 'day'], name='lesson_daily_course_day_idx')]
+
+    def __str__(self):
+        return f"{self.lesson_id} | {self.day}"
+
+
+class AnalyticsWatermark(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class CatalogVersion(models.Model):
+    # a single row, bumped on every change of the catalog reference data, see courses.catalog
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return str(self.version)
+
+
+class CertificateJob(models.Model):
+    PENDING = 'PE'
+    RUNNING = 'RU'
+    READY = 'RE'
+    FAILED = 'FA'
+    STATUS_OPTIONS = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    enrollment = models.OneToOneField(CourseEnrollment, on_delete=models.CASCADE, related_name='certificate_job')
+    status = models.CharField(max_length=2, choices=STATUS_OPTIONS, default=PENDING)
+    # kept next to the lesson files, so it is served the same protected way
+    file = models.FileField(upload_to='certificates/', blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'], name='certificate_job_status_idx')]
+
+    def __str__(self):
+        return f"{self.enrollment_id} | {self.get_status_display()}"
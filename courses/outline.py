@@ -0,0 +1,59 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Course, CourseLesson
+
+
+OutlineLesson = namedtuple('OutlineLesson', ['id', 'title'])
+
+
+class CourseOutline:
+    """
+    The lesson list of a course as shown in the classroom sidebar.
+
+    It is cached per course version (Course.version), so lesson and category changes
+    make every worker build a new one on the next visit.
+    """
+
+    def __init__(self, course_id, version, title, category_title, lessons):
+        self.course_id = course_id
+        self.version = version
+        self.title = title
+        self.category_title = category_title
+        self.lessons = tuple(lessons)
+        self.positions = {lesson.id: i for i, lesson in enumerate(self.lessons)}
+
+    @property
+    def count(self):
+        return len(self.lessons)
+
+    def neighbours(self, lesson_id):
+        """Return the previous and next lesson of lesson_id, None at either end"""
+        position = self.positions[lesson_id]
+        previous = self.lessons[position - 1] if position > 0 else None
+        following = self.lessons[position + 1] if position + 1 < len(self.lessons) else None
+        return previous, following
+
+    @classmethod
+    def build(cls, course_id):
+        course = Course.objects.select_related('category').only('version', 'title', 'category__title').get(id=course_id)
+        lessons = CourseLesson.objects.filter(course_id=course_id).order_by('id').values_list('id', 'title')
+        return cls(course_id, course.version, course.title, course.category.title,
+                   [OutlineLesson(*lesson) for lesson in lessons])
+
+
+def _cache_key(course_id, version):
+    return f'course_outline:{course_id}:{version}'
+
+
+def get_outline(course_id, version, rebuild=False):
+    """Return the cached outline of the course version, built first if missing or when rebuild is set"""
+    key = _cache_key(course_id, version)
+    outline = None if rebuild else cache.get(key)
+    if outline is None:
+        outline = CourseOutline.build(course_id)
+        # a concurrent change may have moved the version on, store under the one that was read
+        cache.set(_cache_key(course_id, outline.version), outline, getattr(settings, 'COURSE_OUTLINE_CACHE_SECONDS', 86400))
+    return outline
@@ -0,0 +1,65 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .catalog import get_catalog_version
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # visitors with a session or pending messages get a page rendered for them
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES and 'messages' not in request.COOKIES
+
+
+def _is_cacheable_response(request, response):
+    # a page with a csrf token or new cookies belongs to one visitor
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not response.has_header('Cache-Control')
+    )
+
+
+def _cache_key(request, version):
+    url = hashlib.md5(request.build_absolute_uri().encode(), usedforsecurity=False).hexdigest()
+    return f'page_cache:{version}:{url}'
+
+
+def cache_anonymous_page(view):
+    """
+    Serve the rendered page from the cache to visitors without a session, keyed on the
+    full URL including the query string. Pages that used a csrf token or set cookies are
+    never stored. The key carries the catalog version from the database, so every catalog
+    change, from any worker or management command, invalidates all pages (see courses.signals).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = _cache_key(request, get_catalog_version())
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        def store(response):
+            if _is_cacheable_response(request, response):
+                timeout = getattr(settings, 'PAGE_CACHE_SECONDS', 600)
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+
+        response = view(request, *args, **kwargs)
+        # template responses are rendered by the handler, after the view returned
+        if getattr(response, 'is_rendered', True):
+            store(response)
+        else:
+            response.add_post_render_callback(store)
+        return response
+
+    return wrapper
@@ -0,0 +1,40 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Course, CourseCategory, CourseInstructor, CourseLesson
+from .catalog import bump_catalog_version
+
+
+@receiver(post_save, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    # save() wrote the version it loaded, moving past it keeps outlines cached before the save from matching
+    Course.objects.filter(id=instance.id).update(version=F('version') + 1)
+
+
+@receiver(pre_save, sender=CourseLesson)
+def lesson_saving(sender, instance, **kwargs):
+    # a lesson moved to another course changes the outline of the course it leaves as well
+    instance._previous_course_id = None
+    if instance.pk is not None:
+        instance._previous_course_id = CourseLesson.objects.filter(pk=instance.pk).values_list('course_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=CourseLesson)
+def lesson_changed(sender, instance, **kwargs):
+    course_ids = {instance.course_id, getattr(instance, '_previous_course_id', None)} - {None}
+    Course.objects.filter(id__in=course_ids).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=CourseCategory)
+def category_changed(sender, instance, **kwargs):
+    Course.objects.filter(category=instance).update(version=F('version') + 1)
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=CourseLesson)
+@receiver([post_save, post_delete], sender=CourseCategory)
+@receiver([post_save, post_delete], sender=CourseInstructor)
+def catalog_changed(sender, **kwargs):
+    # lessons are not part of the snapshot, but the cached course pages list them
+    bump_catalog_version()
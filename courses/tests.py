@@ -1,12 +1,37 @@
-from django.test import TestCase
-from django.test import TestCase
+import io
+import json
+import re
+import unittest
+import shutil
+import tempfile
+from datetime import timedelta
+from urllib.parse import quote
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib import admin
 from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from courses.models import Course, CourseLesson, CourseCategory, CourseInstructor
+from courses.models import (
+    Course, CourseLesson, CourseCategory, CourseInstructor, CourseEnrollment, CourseAttendance, CourseDailyStats, LessonDailyStats,
+    CatalogVersion, CertificateJob
+)
+from courses.analytics import refresh_rollups, get_report
+from courses.admin import EstimatedCountPaginator
+from courses.fixtures import iter_json_objects, import_catalog, FixtureError
+from courses.catalog import get_catalog, get_catalog_version
+from courses.outline import CourseOutline
+from courses.certificate_jobs import process_batch
 
 # Create your tests here.
 
-class CoursesTestCase(TestCase):
+class CourseDataMixin:
     def setUp(self):
         # Create a user
         self.user = User.objects.create_user(username="testuser", password="password123")
@@ -26,8 +51,8 @@ class CoursesTestCase(TestCase):
             description="This is a test course.",
             duration_weeks=6,
             thumbnail="course_thumbnails/test_course.jpg",
-            category_id=1,
-            instructor_id=1,
+            category=self.category,
+            instructor=self.instructor,
             difficulty="BE"
         )
 
@@ -42,6 +67,21 @@ class CoursesTestCase(TestCase):
             )
             setattr(self, f'lesson{i}', lesson)
 
+    def _get_approved_enrollment(self):
+        enrollment = Course.objects.enroll(self.user, self.course.id)
+        enrollment.approved = True
+        enrollment.save()
+        return enrollment
+
+    def _complete_course_lesson(self, all=False):
+        Course.objects.complete_lesson(self.user, self.course.id, self.lesson1.id)
+
+        if all:
+            Course.objects.complete_lesson(self.user, self.course.id, self.lesson2.id)
+            Course.objects.complete_lesson(self.user, self.course.id, self.lesson3.id)
+
+
+class CoursesTestCase(CourseDataMixin, TestCase):
     def test_user_cannot_access_course_before_enrollment(self):
         """Test that user can't access any course before enrollment"""
         pending, current, completed, suggested = Course.objects.get_user_courses(self.user)
@@ -60,12 +100,6 @@ class CoursesTestCase(TestCase):
         self.assertEqual(len(current), 0)
         self.assertEqual(len(completed), 0)
 
-    def _get_approved_enrollment(self):
-        enrollment = Course.objects.enroll(self.user, self.course.id)
-        enrollment.approved = True
-        enrollment.save()
-        return enrollment
-
     def test_course_access_after_approval(self):
         """Test that a user can access the course after enrollment is approved."""
         self._get_approved_enrollment()
@@ -89,13 +123,6 @@ class CoursesTestCase(TestCase):
 
         self.assertEqual(enrollment.can_download_certificate, False)
 
-    def _complete_course_lesson(self, all=False):
-        Course.objects.complete_lesson(self.user, self.course.id, self.lesson1.id)
-
-        if all:
-            Course.objects.complete_lesson(self.user, self.course.id, self.lesson2.id)
-            Course.objects.complete_lesson(self.user, self.course.id, self.lesson3.id)
-
     def test_user_course_progress_and_completion(self):
         """Test course lessons progress is tracked correctly"""
         enrollment = self._get_approved_enrollment()
@@ -122,3 +149,685 @@ class CoursesTestCase(TestCase):
         self._complete_course_lesson(True)
         enrollment.refresh_from_db()
         self.assertEqual(enrollment.can_download_certificate, True)
+
+
+class AnalyticsTestCase(CourseDataMixin, TestCase):
+    def test_attendance_is_timestamped(self):
+        """Test that completing a lesson records when it was attended"""
+        enrollment = self._get_approved_enrollment()
+        self._complete_course_lesson()
+        attendance = CourseAttendance.objects.get(courseenrollment=enrollment, courselesson=self.lesson1)
+        self.assertEqual(timezone.localdate(attendance.attended_at), timezone.localdate())
+
+    @override_settings(ANALYTICS_GRACE_SECONDS=0)
+    def test_rollups_are_incremental(self):
+        """Test that each refresh only folds events newer than the watermark"""
+        self._get_approved_enrollment()
+        self._complete_course_lesson()
+        self.assertEqual(refresh_rollups(), {'attendances': 1, 'completions': 0})
+        self.assertEqual(refresh_rollups(), {'attendances': 0, 'completions': 0})
+
+        Course.objects.complete_lesson(self.user, self.course.id, self.lesson2.id)
+        Course.objects.complete_lesson(self.user, self.course.id, self.lesson3.id)
+        self.assertEqual(refresh_rollups(batch_size=1), {'attendances': 2, 'completions': 1})
+
+        stats = CourseDailyStats.objects.get(course=self.course, day=timezone.localdate())
+        self.assertEqual(stats.attendances, 3)
+        self.assertEqual(stats.active_learners, 1)
+        self.assertEqual(stats.completions, 1)
+        self.assertEqual(LessonDailyStats.objects.filter(course=self.course).count(), 3)
+
+    def test_recent_events_wait_for_grace_period(self):
+        """Test that events are only counted once their transaction can no longer be open"""
+        enrollment = self._get_approved_enrollment()
+        self._complete_course_lesson(all=True)
+        # an older event with a higher id, the watermark must not move past the recent ones before it
+        CourseAttendance.objects.filter(courseenrollment=enrollment, courselesson=self.lesson3).update(
+            attended_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(refresh_rollups(), {'attendances': 0, 'completions': 0})
+
+        # the watermarks stayed behind the events, so they are counted by a later run
+        with self.settings(ANALYTICS_GRACE_SECONDS=0):
+            self.assertEqual(refresh_rollups(), {'attendances': 3, 'completions': 1})
+            self.assertEqual(refresh_rollups(), {'attendances': 0, 'completions': 0})
+
+    @override_settings(ANALYTICS_GRACE_SECONDS=0)
+    def test_report_funnel(self):
+        """Test that the report computes lesson drop-off from the rollups"""
+        self._get_approved_enrollment()
+        self._complete_course_lesson()
+        other = User.objects.create_user(username="otheruser", password="password123")
+        enrollment = Course.objects.enroll(other, self.course.id)
+        enrollment.approved = True
+        enrollment.save()
+        Course.objects.complete_lesson(other, self.course.id, self.lesson1.id)
+        Course.objects.complete_lesson(other, self.course.id, self.lesson2.id)
+        refresh_rollups()
+
+        today = timezone.localdate()
+        report = get_report(today - timedelta(days=1), today, self.course.id)
+        self.assertEqual(report['days'][0]['learners'], 2)
+        self.assertEqual([(i['learners'], i['drop_off']) for i in report['funnel']], [(2, 0), (1, 50.0)])
+
+        # distinct learners can't be added up across courses
+        report = get_report(today - timedelta(days=1), today)
+        self.assertEqual(report['days'][0]['attended'], 3)
+        self.assertNotIn('learners', report['days'][0])
+
+    def test_report_view_requires_staff(self):
+        """Test that only staff members can open the analytics report"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('analytics_report'))
+        self.assertEqual(response.status_code, 302)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('analytics_report'), {'course': self.course.id})
+        self.assertEqual(response.status_code, 200)
+
+
+class EnrollmentAdminTestCase(CourseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="admin", password="password123")
+        self.client.force_login(self.admin)
+
+    def _enroll_users(self, count, offset=0):
+        for i in range(offset, offset + count):
+            user = User.objects.create_user(username=f"learner{i}", password="password123")
+            Course.objects.enroll(user, self.course.id)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Test that the changelist loads courses and users in bulk"""
+        url = reverse('admin:courses_courseenrollment_changelist')
+        self._enroll_users(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        self._enroll_users(8, offset=2)
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(url)
+        self.assertContains(response, "learner9")
+        self.assertEqual(len(few), len(many))
+
+    def test_search_matches_prefix(self):
+        """Test that searching matches usernames and course titles by prefix"""
+        self._enroll_users(2)
+        url = reverse('admin:courses_courseenrollment_changelist')
+        self.assertContains(self.client.get(url, {'q': 'learner1'}), "learner1")
+        self.assertNotContains(self.client.get(url, {'q': 'earner1'}), "learner1")
+        self.assertEqual(self.client.get(url, {'q': 'Test Course'}).context['cl'].result_count, 2)
+
+    def test_paginator_uses_estimate_for_large_tables(self):
+        """Test that the paginator trusts the table statistics only above the threshold"""
+        self._enroll_users(2)
+        queryset = CourseEnrollment.objects.order_by('id')
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 2)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '50000 1' WHERE tbl = 'courses_courseenrollment'")
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 50000)
+        self.assertEqual(EstimatedCountPaginator(queryset.filter(approved=True), 10).count, 0)
+
+
+class CatalogFixtureTestCase(TestCase):
+    def test_stream_parser_handles_small_chunks(self):
+        """Test that objects split across read chunks are parsed for both formats"""
+        objects = [{'model': 'courses.coursecategory', 'pk': i, 'fields': {'title': f"Category [{i}], {{x}}"}} for i in range(5)]
+        array = io.StringIO(json.dumps(objects, indent=2))
+        lines = io.StringIO('\n'.join(json.dumps(i) for i in objects) + '\n')
+        self.assertEqual(list(iter_json_objects(array, chunk_size=7)), objects)
+        self.assertEqual(list(iter_json_objects(lines, chunk_size=7)), objects)
+
+        with self.assertRaises(FixtureError):
+            list(iter_json_objects(io.StringIO(json.dumps(objects)[:-10]), chunk_size=7))
+
+    def test_import_seed_data_in_batches(self):
+        """Test that the seed fixture imports with foreign keys remapped to the new ids"""
+        CourseCategory.objects.create(title="Existing")
+        with open(settings.BASE_DIR / 'data.json', encoding='utf-8') as stream:
+            counts = import_catalog(stream, batch_size=3)
+
+        with open(settings.BASE_DIR / 'data.json', encoding='utf-8') as stream:
+            expected = {}
+            for record in json.load(stream):
+                expected[record['model']] = expected.get(record['model'], 0) + 1
+        self.assertEqual(counts, expected)
+        self.assertEqual(CourseLesson.objects.count(), expected['courses.courselesson'])
+        self.assertFalse(Course.objects.filter(category__title="Existing").exists())
+
+    def test_export_round_trip(self):
+        """Test that an exported catalog can be imported again"""
+        with open(settings.BASE_DIR / 'data.json', encoding='utf-8') as stream:
+            import_catalog(stream)
+        titles = list(CourseLesson.objects.order_by('id').values_list('course__title', 'title'))
+
+        for jsonl in (False, True):
+            output = io.StringIO()
+            call_command('export_catalog', jsonl=jsonl, stdout=output)
+            CourseCategory.objects.all().delete()
+            CourseInstructor.objects.all().delete()
+            import_catalog(io.StringIO(output.getvalue()), batch_size=2)
+            self.assertEqual(list(CourseLesson.objects.order_by('id').values_list('course__title', 'title')), titles)
+
+    def test_creation_times_are_preserved(self):
+        """Test that imported courses keep the creation time of the fixture"""
+        with open(settings.BASE_DIR / 'data.json', encoding='utf-8') as stream:
+            records = [record for record in json.load(stream) if record['model'] != 'courses.courselesson']
+        course = next(record for record in records if record['model'] == 'courses.course')
+        course['fields']['created_at'] = '2020-01-01T00:00:00Z'
+        import_catalog(io.StringIO(json.dumps(records)))
+
+        created = Course.objects.get(title=course['fields']['title']).created_at
+        self.assertEqual(created.isoformat(), '2020-01-01T00:00:00+00:00')
+        self.assertTrue(Course._meta.get_field('created_at').auto_now_add)
+
+    def test_unknown_reference_fails(self):
+        """Test that a lesson pointing at a course missing from the fixture is rejected"""
+        record = {'model': 'courses.courselesson', 'pk': 1, 'fields': {'course': 99, 'title': "Lesson"}}
+        with self.assertRaises(FixtureError):
+            import_catalog(io.StringIO(json.dumps(record)))
+
+    def test_failed_import_bumps_catalog_version(self):
+        """Test that batches committed before an error still invalidate the catalog"""
+        records = [{'model': 'courses.coursecategory', 'pk': i, 'fields': {'title': f"Category {i}"}} for i in range(3)]
+        records.append({'model': 'courses.courselesson', 'pk': 1, 'fields': {'course': 99, 'title': "Lesson"}})
+        version = get_catalog_version()
+        with self.assertRaises(FixtureError):
+            import_catalog(io.StringIO(json.dumps(records)), batch_size=2)
+        self.assertTrue(CourseCategory.objects.filter(title="Category 0").exists())
+        self.assertGreater(get_catalog_version(), version)
+
+
+class GenerateDatasetTestCase(TestCase):
+    def _generate(self, prefix):
+        call_command(
+            'generate_dataset', categories=2, instructors=2, courses=5, lessons=20, users=10, enrollments=30,
+            seed=7, batch_size=8, prefix=prefix, stdout=io.StringIO()
+        )
+
+    def test_generated_counts_and_determinism(self):
+        """Test that the generator creates the requested rows reproducibly"""
+        self._generate('first')
+        self.assertEqual(Course.objects.count(), 5)
+        self.assertEqual(CourseLesson.objects.count(), 20)
+        self.assertEqual(CourseEnrollment.objects.filter(user__username__startswith='first_').count(), 30)
+        first = list(CourseEnrollment.objects.order_by('id').values_list('approved', 'attended_lessons__title'))
+
+        CourseCategory.objects.all().delete()
+        CourseInstructor.objects.all().delete()
+        self._generate('second')
+        second = list(CourseEnrollment.objects.order_by('id').values_list('approved', 'attended_lessons__title'))
+        self.assertEqual(first, second)
+
+
+class LessonFileTestCase(CourseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, LESSON_FILES_ACCEL_PREFIX=None)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.content = bytes(range(256)) * 1024
+        self.lesson1.file.save('slides.pdf', ContentFile(self.content))
+        self.url = reverse('lesson_file', kwargs={'course': self.course.id, 'lesson': self.lesson1.id})
+        self.client.force_login(self.user)
+
+    def test_requires_approved_enrollment(self):
+        """Test that attachments are hidden from learners who are not enrolled"""
+        self.assertTemplateUsed(self.client.get(self.url), 'errors/404.html')
+        self._get_approved_enrollment()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range_requests(self):
+        """Test that single byte ranges are served as partial content"""
+        self._get_approved_enrollment()
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(response.status_code, 200)
+
+        self.lesson1.file.save('empty.pdf', ContentFile(b''))
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_requests(self):
+        """Test that a cached copy is revalidated without sending the file again"""
+        self._get_approved_enrollment()
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_accel_redirect(self):
+        """Test that the transfer is handed off to nginx when configured"""
+        self._get_approved_enrollment()
+        with self.settings(LESSON_FILES_ACCEL_PREFIX='/protected-uploads/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-uploads/{self.lesson1.file.name}')
+        self.assertEqual(response.content, b'')
+
+        self.lesson1.file.save('leçon 1.pdf', ContentFile(self.content))
+        with self.settings(LESSON_FILES_ACCEL_PREFIX='/protected-uploads/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-uploads/{quote(self.lesson1.file.name)}')
+        self.assertTrue(response['X-Accel-Redirect'].isascii())
+
+
+class CertificateVerifyTestCase(CourseDataMixin, TestCase):
+    def test_certificate_id_is_persisted(self):
+        """Test that completing a course stores a unique certificate id"""
+        enrollment = self._get_approved_enrollment()
+        self._complete_course_lesson(True)
+        enrollment.refresh_from_db()
+        self.assertEqual(len(enrollment.certificate_id), 32)
+        self.assertEqual(CourseEnrollment.objects.get(certificate_id=enrollment.certificate_id), enrollment)
+
+    def test_public_verification_is_cached(self):
+        """Test that verification needs no login and is served from cache after the first lookup"""
+        enrollment = self._get_approved_enrollment()
+        self._complete_course_lesson(True)
+        enrollment.refresh_from_db()
+        url = reverse('verify_certificate', kwargs={'certificate_id': enrollment.certificate_id})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, self.course.title)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=86400', response['Cache-Control'])
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(url), self.course.title)
+
+    def test_unknown_certificate(self):
+        """Test that an unknown id is reported as not found"""
+        response = self.client.get(reverse('verify_certificate', kwargs={'certificate_id': 'missing'}))
+        self.assertContains(response, "No certificate was issued", status_code=404)
+
+
+class ApiTestCase(CourseDataMixin, TestCase):
+    def test_catalog_filters_fields_and_cursor(self):
+        """Test that the catalog honours filters, sparse fields and cursor pagination"""
+        for i in range(4):
+            Course.objects.create(
+                title=f"Extra Course {i}", description="Extra", duration_weeks=2, thumbnail="x.jpg",
+                category=self.category, instructor=self.instructor, difficulty="AD"
+            )
+        url = reverse('api_courses')
+        data = self.client.get(url, {'dif': 'AD', 'fields': 'title', 'limit': 3}).json()
+        self.assertEqual(data['results'], [{'title': f"Extra Course {i}"} for i in range(3)])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data['results'], [{'title': "Extra Course 3"}])
+        self.assertIsNone(data['next'])
+
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+
+        self.assertEqual(len(self.client.get(url, {'cat': self.category.id}).json()['results']), 5)
+        response = self.client.get(url, {'cat': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': "Invalid category"})
+
+    def test_etag_revalidation(self):
+        """Test that unchanged responses are answered with 304"""
+        url = reverse('api_course', kwargs={'pk': self.course.id})
+        response = self.client.get(url)
+        self.assertEqual([i['title'] for i in response.json()['lessons']], ["Lesson 1", "Lesson 2", "Lesson 3"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.lesson3.title = "Renamed"
+        self.lesson3.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_progress(self):
+        """Test that progress matches the enrollment properties"""
+        url = reverse('api_progress')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        enrollment = self._get_approved_enrollment()
+        self._complete_course_lesson()
+        self.client.force_login(self.user)
+        with self.assertNumQueries(3):
+            result = self.client.get(url).json()['results'][0]
+        self.assertEqual(result['progress'], enrollment.progress)
+        self.assertEqual(result['attended'], 1)
+        self.assertFalse(result['completed'])
+
+
+class PageCacheTestCase(CourseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_anonymous_pages_are_cached(self):
+        """Test that repeated anonymous requests are served with only the catalog version query"""
+        url = reverse('course_detail', kwargs={'pk': self.course.id})
+        first = self.client.get(url)
+        self.assertNotContains(first, 'csrfmiddlewaretoken')
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('home'))
+
+    def test_query_string_is_part_of_the_key(self):
+        """Test that catalog searches are cached separately"""
+        self.assertContains(self.client.get(reverse('courses'), {'q': 'Test'}), "Test Course")
+        self.assertNotContains(self.client.get(reverse('courses'), {'q': 'Unknown'}), "Test Course")
+
+    def test_bypassed_with_session(self):
+        """Test that logged in users always get a fresh page"""
+        self.client.get(reverse('course_detail', kwargs={'pk': self.course.id}))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('course_detail', kwargs={'pk': self.course.id}))
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(response, self.user.username)
+
+    def test_catalog_changes_invalidate(self):
+        """Test that editing a course or lesson clears the cached pages"""
+        url = reverse('course_detail', kwargs={'pk': self.course.id})
+        self.client.get(url)
+        self.course.title = "Renamed Course"
+        self.course.save()
+        self.assertContains(self.client.get(url), "Renamed Course")
+
+        self.lesson3.delete()
+        self.assertNotContains(self.client.get(url), "Lesson 3")
+
+    def test_version_bump_from_another_worker_invalidates(self):
+        """Test that a catalog version bump made outside this process clears the cached pages"""
+        url = reverse('course_detail', kwargs={'pk': self.course.id})
+        self.client.get(url)
+
+        # another worker or an import renamed the course without running this process's signals
+        Course.objects.filter(id=self.course.id).update(title="Imported Course")
+        self.assertNotContains(self.client.get(url), "Imported Course")
+        CatalogVersion.objects.update_or_create(id=1, defaults={'version': get_catalog_version() + 1})
+        self.assertContains(self.client.get(url), "Imported Course")
+
+
+class ClassroomOutlineTestCase(CourseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self._get_approved_enrollment()
+        self._complete_course_lesson()
+        self.client.force_login(self.user)
+        self.url = reverse('classroom', kwargs={'course': self.course.id, 'lesson': self.lesson2.id})
+
+    def test_renders_from_cached_outline(self):
+        """Test that the classroom needs two queries besides the session once the outline is cached"""
+        response = self.client.get(self.url)
+        self.assertContains(response, "(3 Lessons)")
+        self.assertContains(response, self.category.title)
+        self.assertEqual(response.context['attended_lessons'], {self.lesson1.id})
+        self.assertTrue(response.context['has_next_lesson'])
+
+        # session and user, then the lesson and the attended lessons
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, "Lesson 3")
+
+    def test_outline_neighbours(self):
+        """Test that the outline knows the previous and next lesson"""
+        response = self.client.get(self.url)
+        outline = response.context['outline']
+        self.assertEqual([lesson.id for lesson in outline.neighbours(self.lesson2.id)], [self.lesson1.id, self.lesson3.id])
+        self.assertEqual(outline.neighbours(self.lesson1.id)[0], None)
+        self.assertEqual(outline.neighbours(self.lesson3.id)[1], None)
+
+    def test_lesson_and_category_changes_rebuild_outline(self):
+        """Test that lesson and category changes show up in the sidebar"""
+        self.client.get(self.url)
+        CourseLesson.objects.create(course=self.course, title="Lesson 4", brief="Brief", description="Description",
+                                    youtube_link="https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        self.assertContains(self.client.get(self.url), "(4 Lessons)")
+
+        self.category.title = "Web Development"
+        self.category.save()
+        self.assertContains(self.client.get(self.url), "Web Development")
+
+    def test_lesson_moved_to_another_course(self):
+        """Test that moving a lesson away updates the outline of the course it left"""
+        self.client.get(self.url)
+        other = Course.objects.create(title="Other Course", description="Description", duration_weeks=2,
+                                      category=self.category, instructor=self.instructor, difficulty="BE")
+        self.lesson3.course = other
+        self.lesson3.save()
+        self.assertContains(self.client.get(self.url), "(2 Lessons)")
+
+    def test_stale_outline_without_lesson_is_rebuilt(self):
+        """Test that a cached outline missing the current lesson is replaced instead of failing"""
+        version = Course.objects.get(id=self.course.id).version
+        outline = CourseOutline.build(self.course.id)
+        cache.set(f'course_outline:{self.course.id}:{version}',
+                  CourseOutline(self.course.id, version, outline.title, outline.category_title, outline.lessons[:1]))
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['outline'].count, 3)
+        self.assertTrue(response.context['has_next_lesson'])
+
+    def test_requires_approved_enrollment(self):
+        """Test that other users can't open the classroom"""
+        other = User.objects.create_user(username="otheruser", password="password123")
+        self.client.force_login(other)
+        self.assertTemplateUsed(self.client.get(self.url), 'errors/404.html')
+
+
+class CatalogSnapshotTestCase(CourseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_category = CourseCategory.objects.create(title="Data Science")
+        self.other_course = Course.objects.create(
+            title="Pandas Basics", description="Data frames.", duration_weeks=3, thumbnail="course_thumbnails/test_course.jpg",
+            category=self.other_category, instructor=self.instructor, difficulty="AD"
+        )
+        self.client.force_login(self.user)
+
+    def test_catalog_renders_from_snapshot(self):
+        """Test that the catalog only checks the catalog version once the snapshot is loaded"""
+        self.client.get(reverse('courses'))
+        # session and user, then the version
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('courses'))
+        self.assertContains(response, "Test Course")
+        self.assertContains(response, "Data Science")
+        self.assertContains(response, "Advanced")
+
+    def test_filters(self):
+        """Test that search, category and difficulty filters work on the snapshot"""
+        def titles(**params):
+            return [course.title for course in self.client.get(reverse('courses'), params).context['courses']]
+
+        self.assertEqual(titles(), ["Test Course", "Pandas Basics"])
+        self.assertEqual(titles(q="pandas"), ["Pandas Basics"])
+        self.assertEqual(titles(cat=self.category.id), ["Test Course"])
+        self.assertEqual(titles(dif="AD"), ["Pandas Basics"])
+        self.assertEqual(titles(cat=self.category.id, dif="AD"), [])
+        self.assertEqual(titles(cat="abc"), [])
+        self.assertEqual(titles(cat=""), ["Test Course", "Pandas Basics"])
+
+    def test_snapshot_is_read_only(self):
+        """Test that snapshot entries can't be changed"""
+        course = get_catalog().courses_by_id[self.course.id]
+        self.assertEqual(course.category.title, "Programming Languages")
+        with self.assertRaises(AttributeError):
+            course.title = "Changed"
+        self.assertFalse(hasattr(course, '__dict__'))
+
+    def test_reloads_when_version_changes(self):
+        """Test that a version bump from another worker reloads the snapshot"""
+        snapshot = get_catalog()
+        self.assertIs(get_catalog(), snapshot)
+
+        # another worker renamed the category, only the database version tells this one
+        CourseCategory.objects.filter(id=self.category.id).update(title="Systems")
+        CatalogVersion.objects.update(version=snapshot.version + 1)
+        self.assertEqual(get_catalog().categories_by_id[self.category.id].title, "Systems")
+
+        self.instructor.name = "New Instructor"
+        self.instructor.save()
+        response = self.client.get(reverse('course_detail', kwargs={'pk': self.course.id}))
+        self.assertContains(response, "New Instructor")
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN output is SQLite specific")
+class QueryPlanTestCase(CourseDataMixin, TestCase):
+    def _plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self._plan(queryset)
+        full_scans = [step for step in plan if re.match(r'^SCAN \S+$', step)]
+        self.assertEqual(full_scans, [], f"full table scan in {plan}")
+        self.assertTrue(any(index in step for step in plan), f"{index} not used in {plan}")
+
+    def test_enrollment_lookup(self):
+        """Test that enrollment lookups by user and course use the composite index"""
+        self.assertUsesIndex(self.course.enrollments.filter(user=self.user), 'enrollment_user_course_idx')
+
+    def test_next_lesson(self):
+        """Test that next lesson queries walk the course's lessons by id"""
+        queryset = self.course.lessons.filter(id__gt=self.lesson1.id).order_by('id')[:1]
+        self.assertUsesIndex(queryset, 'lesson_course_id_idx')
+
+    def test_catalog_filters(self):
+        """Test that category and difficulty filters with keyset pagination use an index"""
+        queryset = Course.objects.filter(category=self.category, difficulty='BE', id__gt=0).order_by('id')[:21]
+        self.assertUsesIndex(queryset, 'course_category_difficulty_idx')
+        queryset = Course.objects.filter(difficulty='BE').order_by('id')[:21]
+        self.assertUsesIndex(queryset, 'course_difficulty_idx')
+
+    def test_admin_approved_filter(self):
+        """Test that the admin's pending approvals filter reads the partial index"""
+        queryset = CourseEnrollment.objects.filter(approved=False).order_by('-id')[:100]
+        self.assertUsesIndex(queryset, 'enrollment_pending_idx')
+
+    def test_classroom_queries(self):
+        """Test that the classroom lesson and attendance queries avoid full scans"""
+        queryset = CourseLesson.objects.filter(
+            id=self.lesson1.id, course_id=self.course.id, course__enrollments__user=self.user, course__enrollments__approved=True
+        )
+        self.assertUsesIndex(queryset, 'enrollment_user_course_idx')
+        queryset = CourseAttendance.objects.filter(courseenrollment_id=1).values_list('courselesson_id', flat=True)
+        self.assertUsesIndex(queryset, 'INDEX')
+
+    def test_rollup_learner_recount(self):
+        """Test that the daily distinct learner recount reads the attendance time index"""
+        start = timezone.now()
+        queryset = CourseAttendance.objects.filter(
+            courselesson__course_id=self.course.id, attended_at__gte=start, attended_at__lt=start + timedelta(days=1)
+        ).values('courseenrollment_id').distinct()
+        self.assertUsesIndex(queryset, 'attendance_lesson_time_idx')
+
+    def test_admin_enrollment_search(self):
+        """Test that the admin's enrollment search reads the username and title indexes instead of scanning"""
+        model_admin = admin.site._registry[CourseEnrollment]
+        queryset, _ = model_admin.get_search_results(None, CourseEnrollment.objects.all(), 'test')
+        plan = self._plan(queryset)
+        self.assertIn('MULTI-INDEX OR', plan)
+        self.assertUsesIndex(queryset, '(username>? AND username<?)')
+        self.assertUsesIndex(queryset, '(title>? AND title<?)')
+
+
+class CertificateJobTestCase(CourseDataMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, LESSON_FILES_ACCEL_PREFIX=None)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        self.enrollment = self._get_approved_enrollment()
+        self.url = reverse('generate_certificate', kwargs={'course': self.course.id})
+        self.client.force_login(self.user)
+
+    def test_completion_queues_job(self):
+        """Test that completing the course queues one certificate job"""
+        self._complete_course_lesson(True)
+        job = CertificateJob.objects.get(enrollment=self.enrollment)
+        self.assertEqual(job.status, CertificateJob.PENDING)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json(), {'status': 'processing'})
+        self.assertContains(self.client.get(reverse('completed_course', kwargs={'course': self.course.id})), "Preparing Certificate")
+
+    def test_worker_renders_certificate(self):
+        """Test that the worker renders queued certificates and the view then sends the file"""
+        self._complete_course_lesson(True)
+        out = io.StringIO()
+        call_command('render_certificates', workers=1, stdout=out)
+        self.assertIn("1 rendered, 0 failed", out.getvalue())
+
+        job = CertificateJob.objects.get(enrollment=self.enrollment)
+        self.assertEqual(job.status, CertificateJob.READY)
+        self.assertEqual(self.client.get(self.url, {'status': ''}).json(), {'status': 'ready'})
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+        self.assertIn('attachment', response['Content-Disposition'])
+
+    def test_earlier_completions_are_queued_on_visit(self):
+        """Test that enrollments completed without a job get one when the certificate is requested"""
+        self._complete_course_lesson(True)
+        CertificateJob.objects.all().delete()
+        self.assertEqual(self.client.get(self.url).status_code, 202)
+        self.assertTrue(CertificateJob.objects.filter(enrollment=self.enrollment, status=CertificateJob.PENDING).exists())
+
+    def test_stale_jobs_are_requeued(self):
+        """Test that jobs left running by a dead worker are picked up again"""
+        self._complete_course_lesson(True)
+        CertificateJob.objects.update(status=CertificateJob.RUNNING, started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(process_batch(), (1, 0))
+
+    def test_requires_completion(self):
+        """Test that learners who have not completed the course get no certificate"""
+        self._complete_course_lesson()
+        self.assertTemplateUsed(self.client.get(self.url), 'errors/404.html')
+        self.assertFalse(CertificateJob.objects.exists())
+
+
+class CertificateWorkerPoolTestCase(CourseDataMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_default_worker_pool_renders_certificates(self):
+        """Test that the default pool of spawned worker processes renders queued certificates"""
+        enrollment = self._get_approved_enrollment()
+        self._complete_course_lesson(True)
+        out = io.StringIO()
+        call_command('render_certificates', stdout=out)
+        self.assertIn("1 rendered, 0 failed", out.getvalue())
+
+        job = CertificateJob.objects.get(enrollment=enrollment)
+        self.assertEqual(job.status, CertificateJob.READY)
+        with job.file.open('rb') as f:
+            self.assertEqual(f.read(4), b'%PDF')
@@ -2,7 +2,7 @@ from django.urls import path
 from django.views.generic import TemplateView
 from courses.views import (
     CourseListView, CourseDetailView, CourseEnrollView, ClassroomView, 
-    CompleteLessonView, CourseCertificateView, GenerateCertificateView
+    CompleteLessonView, CourseCertificateView, GenerateCertificateView, LessonFileView, CertificateVerifyView
 )
 
 urlpatterns = [
@@ -12,6 +12,8 @@ urlpatterns = [
     path('<int:pk>/', CourseDetailView.as_view(), name='course_detail'),
     path('classroom/<int:course>/certificate', CourseCertificateView.as_view(), name='completed_course'),
     path('classroom/<int:course>/certificate/download', GenerateCertificateView.as_view(), name='generate_certificate'),
+    path('certificates/<slug:certificate_id>', CertificateVerifyView.as_view(), name='verify_certificate'),
     path('classroom/<int:course>/<int:lesson>', ClassroomView.as_view(), name='classroom'),
+    path('classroom/<int:course>/<int:lesson>/file', LessonFileView.as_view(), name='lesson_file'),
     path('attend/<int:course>/<int:lesson>', CompleteLessonView.as_view(), name='complete_lesson')
 ]
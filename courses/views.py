@@ -1,12 +1,24 @@
+from datetime import date, timedelta
 from django.urls import reverse
-from django.http.response import HttpResponseRedirect, HttpResponse
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_page, cache_control
+from django.http.response import HttpResponseRedirect
 from django.views.generic import ListView, DetailView, View, TemplateView
-from django.http import Http404
-from .models import Course, CourseCategory, CourseLesson, COURSE_DIFFICULTY_OPTIONS
-from .certificate import generate_certificate
+from django.http import Http404, JsonResponse
+from django.utils.http import content_disposition_header
+from .models import Course, CourseLesson, CourseEnrollment, CertificateJob, COURSE_DIFFICULTY_OPTIONS
+from .analytics import get_report
+from .downloads import serve_protected_file
+from .page_cache import cache_anonymous_page
+from .outline import get_outline
+from .catalog import get_catalog
 
 # Create your views here.
 
+@method_decorator(cache_anonymous_page, name='dispatch')
 class HomeView(TemplateView):
     template_name = 'home.html'
 
@@ -32,38 +44,40 @@ class HomeView(TemplateView):
         return context
 
 
+@method_decorator(cache_anonymous_page, name='dispatch')
 class CourseListView(ListView):
     model = Course
     template_name = 'courses.html'
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = Course.objects.all()
+        # filtered in memory from the worker's catalog snapshot, see courses.catalog
+        self.catalog = get_catalog()
         search_query = self.request.GET.get('q', None)
-        category = self.request.GET.get('cat', None)
         difficulty = self.request.GET.get('dif', None)
 
-        if search_query:
-            queryset = queryset.filter(title__icontains=search_query)
-        if category:
-            queryset = queryset.filter(category=category)
-        if difficulty:
-            queryset = queryset.filter(difficulty=difficulty)
+        # parsed once, the template needs it to mark the selected category
+        try:
+            self.category = int(self.request.GET.get('cat') or 0)
+        except ValueError:
+            self.category = 0
+            return []
 
-        return queryset
+        return self.catalog.filter_courses(search=search_query, category=self.category or None, difficulty=difficulty)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         courses = self.object_list
         context['courses'] = courses
-        context['categories'] = CourseCategory.objects.all()
+        context['categories'] = self.catalog.categories
         context['levels'] = COURSE_DIFFICULTY_OPTIONS
         context['search_q'] = self.request.GET.get('q', '')
         context['dif'] = self.request.GET.get('dif', '')
-        context['cat'] = int(self.request.GET.get('cat', '0'))
+        context['cat'] = self.category
         return context
 
 
+@method_decorator(cache_anonymous_page, name='dispatch')
 class CourseDetailView(DetailView):
     model = Course
     template_name = 'course_detail.html'
@@ -71,7 +85,10 @@ class CourseDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         course = context['course']
+        catalog = get_catalog()
         enrollment = course.get_enrollment(self.request.user)
+        context['category'] = catalog.categories_by_id.get(course.category_id)
+        context['instructor'] = catalog.instructors_by_id.get(course.instructor_id)
         context['is_enrolled'] = enrollment is not None
         context['is_approved'] = enrollment is not None and enrollment.approved
         return context
@@ -85,23 +102,44 @@ class ClassroomView(DetailView):
         try:
             course_id = self.kwargs.get('course')
             lesson_id = self.kwargs.get('lesson')
-            return Course.objects.get_lesson(self.request.user, course_id, lesson_id)
+            lesson, self.attended_lessons = Course.objects.get_classroom_lesson(self.request.user, course_id, lesson_id)
+            return lesson
         except (Course.DoesNotExist, CourseLesson.DoesNotExist):
             raise Http404("No lesson found matching the query")
         
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         lesson = context['courselesson']
-        enrollment = lesson.course.get_enrollment(self.request.user)
-        attended_lessons = enrollment.attended_lessons.values_list('id', flat=True)
-        next_lesson = lesson.course.lessons.filter(id__gt=lesson.id).exists()
+        outline = get_outline(lesson.course_id, lesson.course_version)
+        if lesson.id not in outline.positions:
+            # built while the lesson was being added or moved, before the course version moved on
+            outline = get_outline(lesson.course_id, lesson.course_version, rebuild=True)
+            if lesson.id not in outline.positions:
+                raise Http404("No lesson found matching the query")
+        _, next_lesson = outline.neighbours(lesson.id)
 
         context['current_lesson'] = lesson
-        context['attended_lessons'] = attended_lessons
-        context['has_next_lesson'] = next_lesson
+        context['outline'] = outline
+        context['attended_lessons'] = self.attended_lessons
+        context['has_next_lesson'] = next_lesson is not None
         return context
 
 
+class LessonFileView(View):
+    def get(self, request, *args, **kwargs):
+        try:
+            lesson = Course.objects.get_lesson(request.user, kwargs.get('course'), kwargs.get('lesson'))
+        except (Course.DoesNotExist, CourseLesson.DoesNotExist):
+            raise Http404("No lesson found matching the query")
+
+        if not lesson.file:
+            raise Http404("This lesson has no attachment")
+        try:
+            return serve_protected_file(request, lesson.file)
+        except FileNotFoundError:
+            raise Http404("This lesson has no attachment")
+
+
 class CourseEnrollView(View):
     def post(self, request, *args, **kwargs):
         course_id = kwargs.get('pk')
@@ -146,6 +184,8 @@ class CourseCertificateView(DetailView):
             raise Http404
         
         context['is_completed'] = enrollment.is_completed
+        context['certificate_id'] = enrollment.certificate_id
+        context['certificate_ready'] = CertificateJob.objects.filter(enrollment=enrollment, status=CertificateJob.READY).exists()
         context['progress_percentage'] = enrollment.progress
         context['next_lesson'] = enrollment.next_lesson
         return context
@@ -160,11 +200,76 @@ class GenerateCertificateView(View):
 
         course = Course.objects.get(id=course_id)
         enrollment = course.get_enrollment(request.user)
-        if not enrollment.can_download_certificate:
+        if enrollment is None or not enrollment.can_download_certificate:
             raise Http404
-        
-        response = HttpResponse(content_type='application/pdf')        
-        response['Content-Disposition'] = f'attachment; filename="certificate_{course.title}.pdf"'
-        generate_certificate(response, request.user, course, enrollment)
+
+        # enrollments completed before the queue existed get their job on the first visit
+        job, _ = CertificateJob.objects.get_or_create(enrollment=enrollment)
+        if job.status == CertificateJob.READY and 'status' not in request.GET:
+            try:
+                response = serve_protected_file(request, job.file)
+            except FileNotFoundError:
+                job.status = CertificateJob.PENDING
+                job.save(update_fields=['status'])
+            else:
+                response['Content-Disposition'] = content_disposition_header(True, f"certificate_{course.title}.pdf")
+                return response
+
+        # a small status document the certificate page polls until the file is ready
+        status = {CertificateJob.READY: 'ready', CertificateJob.FAILED: 'failed'}.get(job.status, 'processing')
+        response = JsonResponse({'status': status}, status=200 if status == 'ready' else 202)
+        response['Cache-Control'] = 'no-store'
         return response
-    
\ No newline at end of file
+
+
+# certificates never change once issued, so verification pages can be cached for a long time
+CERTIFICATE_VERIFY_CACHE_SECONDS = 60 * 60 * 24
+
+
+@method_decorator(cache_page(CERTIFICATE_VERIFY_CACHE_SECONDS), name='dispatch')
+@method_decorator(cache_control(public=True, max_age=CERTIFICATE_VERIFY_CACHE_SECONDS), name='dispatch')
+class CertificateVerifyView(TemplateView):
+    template_name = 'certificate_verify.html'
+
+    def get(self, request, *args, **kwargs):
+        enrollment = (
+            CourseEnrollment.objects
+            .select_related('course__instructor', 'user')
+            .only('completed_date', 'certificate_id', 'course__title', 'course__instructor__name',
+                  'user__username', 'user__first_name', 'user__last_name')
+            .filter(certificate_id=kwargs.get('certificate_id'))
+            .first()
+        )
+        context = self.get_context_data(enrollment=enrollment, **kwargs)
+        # unknown ids are answered with a 404, which cache_page does not store
+        return self.render_to_response(context, status=200 if enrollment is not None else 404)
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class AnalyticsReportView(TemplateView):
+    template_name = 'analytics_report.html'
+
+    def _get_date(self, name, default):
+        try:
+            return date.fromisoformat(self.request.GET[name])
+        except (KeyError, ValueError):
+            return default
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        end = self._get_date('end', timezone.localdate())
+        start = self._get_date('start', end - timedelta(days=30))
+        try:
+            course_id = int(self.request.GET.get('course', '0'))
+        except ValueError:
+            course_id = 0
+
+        report = get_report(start, end, course_id or None)
+        context.update(admin.site.each_context(self.request))
+        context['title'] = "Learning Analytics"
+        context['start'] = start
+        context['end'] = end
+        context['course_id'] = course_id
+        context['days'] = report['days']
+        context['funnel'] = report['funnel']
+        return context
@@ -0,0 +1,14 @@
+# kept free of model imports: spawned pool processes import this module before Django is set up
+
+# settings a worker takes over from the process that started the pool, they may differ from the settings module (tests)
+INHERITED_SETTINGS = ('DATABASES', 'MEDIA_ROOT')
+
+
+def init_worker(overrides=None):
+    # pool processes are spawned, not forked, so each one sets Django up and opens its own connections
+    import django
+    from django.conf import settings
+
+    for name, value in (overrides or {}).items():
+        setattr(settings, name, value)
+    django.setup()
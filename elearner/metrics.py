@@ -0,0 +1,213 @@
+import ipaddress
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+
+PREFIX = 'elearner'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1000, 5000, 10000, 25000, 50000, 100000, 500000, 1000000)
+METRICS = {
+    # name: (type, help, buckets)
+    'requests_total': ('counter', "Requests by route, method and status", None),
+    'request_duration_seconds': ('histogram', "Time spent handling a request", DURATION_BUCKETS),
+    'response_size_bytes': ('histogram', "Size of the response body as sent", SIZE_BUCKETS),
+    'db_duration_seconds': ('histogram', "Time spent in database queries per request", DURATION_BUCKETS),
+    'db_queries_total': ('counter', "Database queries by route", None),
+}
+DEFAULT_ALLOWED_NETWORKS = ('127.0.0.0/8', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '::1/128', 'fc00::/7')
+DEFAULT_TRUSTED_PROXIES = ('127.0.0.1', '::1')
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    """
+    Metrics of the current process.
+
+    Every process periodically writes its values to its own file in METRICS_DIR, and the
+    endpoint sums all files, so the numbers cover every gunicorn worker, including recycled ones.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.pid = os.getpid()
+
+    def reset_after_fork(self):
+        # a forked worker must not report the values it inherited from the master as its own
+        if os.getpid() != self.pid:
+            self.lock = threading.Lock()
+            self.flush_lock = threading.Lock()
+            self.clear()
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def dump(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(h[0]), h[1], h[2]] for (name, labels), h in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        directory = get_metrics_dir()
+        if directory is None or not (self.counters or self.histograms):
+            return
+        # with threaded workers another thread may be writing the same file, a periodic flush just skips its turn
+        if not self.flush_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self.last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+                return
+            self.last_flush = now
+
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'worker-{os.getpid()}.json'
+            temporary = path.with_suffix('.tmp')
+            temporary.write_text(json.dumps(self.dump()))
+            # readers never see a half written file
+            os.replace(temporary, path)
+        except OSError:
+            # metrics must never fail the request that happened to trigger the write
+            logger.exception("Writing the metrics file failed")
+        finally:
+            self.flush_lock.release()
+
+
+registry = Registry()
+
+
+def get_metrics_dir():
+    directory = getattr(settings, 'METRICS_DIR', None)
+    return Path(directory) if directory else None
+
+
+def reset_metrics_dir():
+    """Remove the files of a previous run, called by the gunicorn master before forking workers"""
+    directory = get_metrics_dir()
+    if directory is not None and directory.exists():
+        for path in directory.glob('worker-*.json'):
+            path.unlink(missing_ok=True)
+
+
+def collect():
+    """Sum the values of every worker file plus the live values of this process"""
+    counters = {}
+    histograms = {}
+    own_file = f'worker-{os.getpid()}.json'
+    dumps = [registry.dump()]
+
+    directory = get_metrics_dir()
+    if directory is not None and directory.exists():
+        for path in directory.glob('worker-*.json'):
+            if path.name == own_file:
+                continue
+            try:
+                dumps.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+
+    for dump in dumps:
+        for name, labels, value in dump['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in dump['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets)]
+            merged[1] += total
+            merged[2] += count
+    return counters, histograms
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render_prometheus():
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        full_name = f'{PREFIX}_{name}'
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{full_name}{_labels(labels)} {value}')
+            continue
+
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            # buckets are stored per bound and exported cumulatively
+            for bound, bucket_count in zip(buckets, counts):
+                lines.append(f'{full_name}_bucket{_labels(labels, [("le", bound)])} {bucket_count}')
+            lines.append(f'{full_name}_bucket{_labels(labels, [("le", "+Inf")])} {count}')
+            lines.append(f'{full_name}_sum{_labels(labels)} {total}')
+            lines.append(f'{full_name}_count{_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def _client_address(request):
+    address = request.META.get('REMOTE_ADDR', '')
+    # the header is only as trustworthy as the peer that sent it, anyone reaching gunicorn directly can set it
+    if address not in getattr(settings, 'METRICS_TRUSTED_PROXIES', DEFAULT_TRUSTED_PROXIES):
+        return address
+    # behind nginx the real client is the address nginx appended last, earlier entries can be forged
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[-1].strip()
+    return address
+
+
+def is_internal(request):
+    try:
+        address = ipaddress.ip_address(_client_address(request))
+    except ValueError:
+        return False
+    networks = getattr(settings, 'METRICS_ALLOWED_NETWORKS', DEFAULT_ALLOWED_NETWORKS)
+    return any(address in ipaddress.ip_network(network) for network in networks)
+
+
+def metrics_view(request):
+    if not is_internal(request):
+        raise Http404
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
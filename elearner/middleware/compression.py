@@ -0,0 +1,137 @@
+import re
+import zlib
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+
+DEFAULT_EXCLUDED_TYPES = (
+    'application/pdf', 'application/zip', 'application/gzip', 'application/x-7z-compressed',
+    'image/', 'video/', 'audio/', 'font/woff', 'font/woff2',
+)
+ACCEPT_ENCODING_RE = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick br or gzip from an Accept-Encoding header, preferring br on equal weights"""
+    weights = {}
+    for part in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if match is None:
+            continue
+        try:
+            weights[match.group(1).lower()] = float(match.group(2) or 1)
+        except ValueError:
+            continue
+
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_weight = None, 0
+    for encoding in candidates:
+        weight = weights.get(encoding, weights.get('*', 0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding, brotli_quality, gzip_level):
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._process = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # wbits 31 writes the gzip header and trailer
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._process = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def compress(self, data):
+        return self._process(data) + self._finish()
+
+    def stream(self, chunks):
+        for chunk in chunks:
+            if chunk:
+                # flushing per chunk keeps the response streaming instead of buffering it all
+                data = self._process(chunk) + self._flush()
+                if data:
+                    yield data
+        yield self._finish()
+
+
+def compress_bytes(data, encoding, brotli_quality=4, gzip_level=6):
+    return _Compressor(encoding, brotli_quality, gzip_level).compress(data)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with Brotli or gzip, whichever the client prefers.
+
+    Settings: COMPRESSION_MIN_SIZE (bytes, default 500), COMPRESSION_BROTLI_QUALITY (0-11, default 4),
+    COMPRESSION_GZIP_LEVEL (1-9, default 6) and COMPRESSION_EXCLUDED_TYPES (content type prefixes
+    that are already compressed, such as the certificate PDF).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 500)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 4)
+        self.gzip_level = getattr(settings, 'COMPRESSION_GZIP_LEVEL', 6)
+        self.excluded_types = tuple(getattr(settings, 'COMPRESSION_EXCLUDED_TYPES', DEFAULT_EXCLUDED_TYPES))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not self._should_compress(response):
+            return response
+
+        # the representation depends on Accept-Encoding even when this client gets it uncompressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressor = _Compressor(encoding, self.brotli_quality, self.gzip_level)
+        if response.streaming:
+            if response.is_async:
+                return response
+            response.streaming_content = compressor.stream(response.streaming_content)
+            del response['Content-Length']
+        else:
+            compressed = compressor.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(response.content))
+
+        # the compressed body is a different byte sequence, a strong validator would no longer match it
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'^"', 'W/"', response['ETag'])
+        response['Content-Encoding'] = encoding
+        return response
+
+    def _should_compress(self, response):
+        if response.has_header('Content-Encoding') or response.has_header('X-Accel-Redirect'):
+            return False
+        if response.status_code in (204, 206, 304) or response.has_header('Content-Range'):
+            return False
+        # files keep sendfile and byte ranges, the offsets a client resumes from refer to the raw bytes
+        if isinstance(response, FileResponse) or response.has_header('Accept-Ranges'):
+            return False
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return False
+
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type.startswith(self.excluded_types):
+            return False
+
+        if response.streaming:
+            length = response.get('Content-Length')
+            return length is None or int(length) >= self.min_size
+        return len(response.content) >= self.min_size
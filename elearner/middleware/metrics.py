@@ -0,0 +1,53 @@
+import contextlib
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.conf import settings
+from django.db import connections
+
+from elearner.metrics import registry
+from .profiling import _QueryTimer
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency, response size and database time per URL name.
+
+    It sits first in MIDDLEWARE so the latency covers the whole stack and the size is
+    measured after compression. Values are kept in elearner.metrics.registry and written
+    to METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        registry.reset_after_fork()
+        queries = _QueryTimer()
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        # unresolved paths share one label, otherwise every 404 would create new series
+        route = (match.view_name if match is not None and match.view_name else None) or 'unresolved'
+        if route == 'metrics':
+            return response
+
+        labels = (('route', route),)
+        registry.inc('requests_total', labels + (('method', request.method), ('status', str(response.status_code))))
+        registry.observe('request_duration_seconds', labels, duration)
+        registry.observe('db_duration_seconds', labels, queries.seconds)
+        registry.inc('db_queries_total', labels, queries.count)
+        if not response.streaming:
+            registry.observe('response_size_bytes', labels, len(response.content))
+        elif response.has_header('Content-Length'):
+            registry.observe('response_size_bytes', labels, int(response['Content-Length']))
+
+        registry.flush()
+        return response
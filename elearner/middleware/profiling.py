@@ -0,0 +1,108 @@
+import cProfile
+import contextlib
+import json
+import os
+import random
+import re
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class ProfilingMiddleware:
+    """
+    Run a sample of requests under cProfile and store the stats per URL name.
+
+    PROFILING_SAMPLE_RATE (0 to 1) picks random requests, PROFILING_HEADER lets staff users
+    force a profile by sending that header. Each profile is written to
+    PROFILING_OUTPUT_DIR/<url name>/ as a .prof file (pstats, readable by snakeviz or flameprof)
+    with a .json summary of total, database and template rendering time.
+    When both options are off the middleware removes itself at startup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        header = getattr(settings, 'PROFILING_HEADER', None)
+        self.header = 'HTTP_' + header.upper().replace('-', '_') if header else None
+        self.output_dir = Path(getattr(settings, 'PROFILING_OUTPUT_DIR', settings.BASE_DIR / 'profiles'))
+        if not self.sample_rate and not self.header:
+            raise MiddlewareNotUsed
+
+    def _should_profile(self, request):
+        if self.header and self.header in request.META:
+            user = getattr(request, 'user', None)
+            return user is not None and user.is_staff
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        request._profiling_template_seconds = 0.0
+        queries = _QueryTimer()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        total = time.perf_counter() - start
+
+        self._save(request, response, profiler, {
+            'total_ms': total * 1000,
+            'db_ms': queries.seconds * 1000,
+            'queries': queries.count,
+            'template_ms': request._profiling_template_seconds * 1000,
+        })
+        return response
+
+    def process_template_response(self, request, response):
+        if not hasattr(request, '_profiling_template_seconds'):
+            return response
+
+        # the handler renders template responses right after this hook, time that call
+        render = response.render
+
+        def timed_render():
+            start = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request._profiling_template_seconds += time.perf_counter() - start
+
+        response.render = timed_render
+        return response
+
+    def _save(self, request, response, profiler, summary):
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.view_name if match is not None and match.view_name else None) or 'unresolved'
+        directory = self.output_dir / re.sub(r'[^\w.-]', '_', url_name)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{random.randrange(16 ** 6):06x}"
+        profiler.dump_stats(directory / f"{name}.prof")
+        summary.update({'path': request.path, 'method': request.method, 'status': response.status_code, 'url_name': url_name})
+        (directory / f"{name}.json").write_text(json.dumps(summary, indent=2))
+
@@ -27,11 +27,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'elearner.middleware.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'elearner.middleware.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'elearner.middleware.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,6 +67,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # a file rather than memory, so spawned render_certificates workers can reach it in tests
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -98,6 +103,44 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Response compression (Brotli or gzip, negotiated per request)
+
+COMPRESSION_MIN_SIZE = 500  # bytes, smaller responses are sent as they are
+COMPRESSION_BROTLI_QUALITY = 4  # 0-11, higher qualities cost far more CPU for dynamic pages
+COMPRESSION_GZIP_LEVEL = 6  # 1-9
+
+
+# Request profiling, off unless one of the triggers is set
+
+PROFILING_SAMPLE_RATE = 0  # fraction of requests to profile, e.g. 0.01
+PROFILING_HEADER = 'X-Profile'  # staff users can force a profile by sending this header
+PROFILING_OUTPUT_DIR = BASE_DIR / 'profiles'
+
+
+# Certificates are rendered by the render_certificates worker
+
+CERTIFICATE_JOB_TIMEOUT = 300  # seconds before a job left running by a dead worker is queued again
+
+
+# Full-page cache for visitors without a session, cleared whenever the catalog changes
+
+PAGE_CACHE_SECONDS = 600
+
+
+# Learning analytics rollups, refreshed by `python manage.py refresh_analytics`
+
+ANALYTICS_GRACE_SECONDS = 300  # attendances and completions younger than this wait for the next refresh, their transaction may still be open
+
+
+# Request metrics, served in Prometheus format at /metrics
+
+METRICS_ENABLED = True
+METRICS_DIR = BASE_DIR / 'metrics'  # every worker writes its values here, cleared when gunicorn starts
+METRICS_FLUSH_INTERVAL = 5  # seconds between writes of a worker's file
+METRICS_ALLOWED_NETWORKS = ['127.0.0.0/8', '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '::1/128', 'fc00::/7']
+METRICS_TRUSTED_PROXIES = ['127.0.0.1', '::1']  # peers whose X-Forwarded-For is believed, nginx on this host
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
@@ -116,7 +159,12 @@ LOGIN_REDIRECT_URL = "home"
 LOGOUT_REDIRECT_URL = "home"
 
 # Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# mail is queued in the database and delivered by `python manage.py send_outbox --loop`
+EMAIL_BACKEND = 'accounts.mail.OutboxEmailBackend'
+OUTBOX_DELIVERY_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+OUTBOX_RETRY_DELAY = 60  # seconds before the first retry, doubled on every failed attempt
+OUTBOX_MAX_RETRY_DELAY = 3600
+OUTBOX_SENDING_TIMEOUT = 300  # seconds a worker may hold claimed messages before others pick them up again
 
 # Use Gmail's SMTP server
 EMAIL_HOST = 'smtp.gmail.com'
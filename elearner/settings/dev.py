@@ -13,3 +13,5 @@ ALLOWED_HOSTS = []
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_ROOT = BASE_DIR / 'uploads'
+# lesson attachments are streamed by Django itself
+LESSON_FILES_ACCEL_PREFIX = None
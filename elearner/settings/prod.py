@@ -45,3 +45,5 @@ SESSION_COOKIE_SECURE = True
 
 STATIC_ROOT = '/var/www/elearner/static'
 MEDIA_ROOT = '/var/www/elearner/uploads'
+# lesson attachments are handed to nginx through this internal location (X-Accel-Redirect)
+LESSON_FILES_ACCEL_PREFIX = '/protected-uploads/'
@@ -0,0 +1,195 @@
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+import brotli
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from elearner.metrics import registry
+from elearner.middleware.compression import CompressionMiddleware, negotiate_encoding
+from elearner.warmup import warm_up, compile_templates
+
+
+PAGE = b'<div class="px-4 py-2 bg-indigo-600 text-white rounded-lg shadow">Lesson</div>\n' * 100
+
+
+@override_settings(COMPRESSION_MIN_SIZE=500)
+class CompressionMiddlewareTestCase(SimpleTestCase):
+    def _get(self, response, accept_encoding='gzip, deflate, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation(self):
+        """Test that br is preferred unless the client weights gzip higher"""
+        self.assertEqual(negotiate_encoding('gzip, deflate, br'), 'br')
+        self.assertEqual(negotiate_encoding('br;q=0.5, gzip'), 'gzip')
+        self.assertEqual(negotiate_encoding('br;q=0, gzip;q=0'), None)
+        self.assertEqual(negotiate_encoding('identity'), None)
+
+    def test_compresses_html(self):
+        """Test that large pages are compressed with the negotiated encoding"""
+        response = self._get(HttpResponse(PAGE))
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), PAGE)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        response = self._get(HttpResponse(PAGE), 'gzip')
+        self.assertEqual(gzip.decompress(response.content), PAGE)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def test_streaming_responses(self):
+        """Test that streaming responses are compressed chunk by chunk"""
+        response = self._get(StreamingHttpResponse(iter([PAGE, PAGE])), 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), PAGE * 2)
+
+    def test_skips_small_and_precompressed_responses(self):
+        """Test that small bodies and already compressed types are sent as they are"""
+        self.assertFalse(self._get(HttpResponse(b'small')).has_header('Content-Encoding'))
+        pdf = HttpResponse(PAGE, content_type='application/pdf')
+        self.assertEqual(self._get(pdf).content, PAGE)
+        partial = HttpResponse(PAGE, status=206)
+        self.assertFalse(self._get(partial).has_header('Content-Encoding'))
+
+    def test_skips_file_and_range_responses(self):
+        """Test that files and responses offering byte ranges keep their raw bytes"""
+        response = self._get(FileResponse(io.BytesIO(PAGE), content_type='text/plain'), 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), PAGE)
+
+        ranged = StreamingHttpResponse(iter([PAGE]))
+        ranged['Accept-Ranges'] = 'bytes'
+        self.assertFalse(self._get(ranged, 'gzip').has_header('Content-Encoding'))
+
+
+class WarmUpTestCase(SimpleTestCase):
+    databases = '__all__'
+
+    def test_compiles_project_templates(self):
+        """Test that every template under the project template directories is loaded"""
+        self.assertGreaterEqual(compile_templates(), 20)
+        engines['django'].get_template('classroom.html')
+
+    def test_warm_up_steps(self):
+        """Test that warm-up reports each step"""
+        self.assertEqual(set(warm_up()), {'django', 'templates', 'urls', 'certificate'})
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def _profiles(self, url_name):
+        return sorted((self.output_dir / url_name).glob('*.json')) if (self.output_dir / url_name).exists() else []
+
+    def test_header_requires_staff(self):
+        """Test that only staff users can force a profile with the header"""
+        user = User.objects.create_user(username="testuser", password="password123")
+        self.client.force_login(user)
+        with self.settings(PROFILING_SAMPLE_RATE=0, PROFILING_HEADER='X-Profile', PROFILING_OUTPUT_DIR=self.output_dir):
+            self.client.get('/courses/', HTTP_X_PROFILE='1')
+            self.assertEqual(self._profiles('courses'), [])
+
+            user.is_staff = True
+            user.save()
+            self.client.get('/courses/', HTTP_X_PROFILE='1')
+        profiles = self._profiles('courses')
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].with_suffix('.prof').exists())
+        summary = json.loads(profiles[0].read_text())
+        self.assertGreater(summary['template_ms'], 0)
+        self.assertGreater(summary['queries'], 0)
+
+    def test_sampling(self):
+        """Test that sampled requests are profiled without the header"""
+        with self.settings(PROFILING_SAMPLE_RATE=1, PROFILING_HEADER=None, PROFILING_OUTPUT_DIR=self.output_dir):
+            self.client.get('/about')
+        self.assertEqual(len(self._profiles('about')), 1)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.metrics_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+    def test_records_requests_per_route(self):
+        """Test that requests are counted with their latency, size and database time"""
+        with self.settings(METRICS_DIR=self.metrics_dir):
+            self.client.get('/courses/')
+            self.client.get('/courses/')
+            self.client.get('/does-not-exist')
+            body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('elearner_requests_total{route="courses",method="GET",status="200"} 2', body)
+        self.assertIn('elearner_requests_total{route="unresolved",method="GET"', body)
+        self.assertIn('elearner_request_duration_seconds_bucket{route="courses",le="+Inf"} 2', body)
+        self.assertIn('elearner_response_size_bytes_count{route="courses"} 2', body)
+        self.assertIn('elearner_db_duration_seconds_count{route="courses"} 2', body)
+        self.assertNotIn('route="metrics"', body)
+
+    def test_aggregates_worker_files(self):
+        """Test that the endpoint adds up the files written by other workers"""
+        with self.settings(METRICS_DIR=self.metrics_dir, METRICS_FLUSH_INTERVAL=0):
+            self.client.get('/about')
+            # the file of another worker that served the same route
+            own_file = next(self.metrics_dir.glob('worker-*.json'))
+            (self.metrics_dir / 'worker-1.json').write_text(own_file.read_text())
+            (self.metrics_dir / 'worker-2.json').write_text('{broken')
+            body = self.client.get('/metrics').content.decode()
+
+        self.assertIn('elearner_requests_total{route="about",method="GET",status="200"} 2', body)
+        self.assertIn('elearner_request_duration_seconds_count{route="about"} 2', body)
+
+    def test_concurrent_flushes(self):
+        """Test that threads of one worker can flush at the same time without failing"""
+        registry.inc('requests_total', (('route', 'about'),))
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(50):
+                    registry.flush(force=True)
+            except Exception as e:
+                errors.append(e)
+
+        with self.settings(METRICS_DIR=self.metrics_dir):
+            threads = [threading.Thread(target=flush) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(list(self.metrics_dir.glob('worker-*.json'))), 1)
+
+    def test_write_errors_do_not_fail_requests(self):
+        """Test that a metrics directory that can't be written doesn't break pages"""
+        blocked = self.metrics_dir / 'file'
+        blocked.write_text('')
+        with self.settings(METRICS_DIR=blocked, METRICS_FLUSH_INTERVAL=0), self.assertLogs('elearner.metrics', 'ERROR'):
+            self.assertEqual(self.client.get('/about').status_code, 200)
+
+    def test_restricted_to_internal_addresses(self):
+        """Test that the endpoint is hidden from public addresses, including forged forwarding headers"""
+        self.assertIn('# TYPE elearner_requests_total counter', self.client.get('/metrics').content.decode())
+
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.7')
+        self.assertTemplateUsed(response, 'errors/404.html')
+        response = self.client.get('/metrics', HTTP_X_FORWARDED_FOR='127.0.0.1, 203.0.113.7')
+        self.assertTemplateUsed(response, 'errors/404.html')
+
+        response = self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.7, 10.0.0.5')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+
+        # only a trusted proxy may speak for the client
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.7', HTTP_X_FORWARDED_FOR='10.0.0.5')
+        self.assertTemplateUsed(response, 'errors/404.html')
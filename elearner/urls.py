@@ -18,18 +18,23 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls import handler404, handler500, handler403, handler400
 from django.conf.urls.static import static
-from courses.views import HomeView, TemplateView
+from courses.views import HomeView, TemplateView, AnalyticsReportView
 from django.conf import settings
+from elearner.metrics import metrics_view
+from courses.page_cache import cache_anonymous_page
 
 
 urlpatterns = [
+    path('admin/analytics/', AnalyticsReportView.as_view(), name='analytics_report'),
     path('admin/', admin.site.urls),
     path("accounts/", include("accounts.urls")), 
     path("courses/", include("courses.urls")), 
+    path("api/", include("courses.api_urls")),
     path('', HomeView.as_view(), name='home'),
-    path('policy', TemplateView.as_view(template_name='policy.html'), name='policy'),
-    path('faq', TemplateView.as_view(template_name='faq.html'), name='faq'),
-    path('about', TemplateView.as_view(template_name='about.html'), name='about'),
+    path('policy', cache_anonymous_page(TemplateView.as_view(template_name='policy.html')), name='policy'),
+    path('faq', cache_anonymous_page(TemplateView.as_view(template_name='faq.html')), name='faq'),
+    path('about', cache_anonymous_page(TemplateView.as_view(template_name='about.html')), name='about'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 handler400 = TemplateView.as_view(template_name="errors/400.html")
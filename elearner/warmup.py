@@ -0,0 +1,73 @@
+import os
+import time
+from pathlib import Path
+
+# the fonts drawn by courses.certificate.generate_certificate
+CERTIFICATE_FONTS = ('Times-Bold', 'Times-Roman', 'Times-Italic', 'Helvetica', 'Helvetica-Bold')
+
+
+def _setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'elearner.settings')
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def compile_templates():
+    """Load every project template once so the cached loader holds the compiled versions"""
+    from django.template import engines
+    from django.template.backends.django import DjangoTemplates
+
+    count = 0
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for directory in engine.engine.dirs:
+            directory = Path(directory)
+            for path in sorted(directory.rglob('*.html')):
+                engine.get_template(path.relative_to(directory).as_posix())
+                count += 1
+    return count
+
+
+def prime_url_resolver():
+    from django.urls import get_resolver
+    resolver = get_resolver()
+    # reverse_dict builds the whole reverse lookup table, which also populates the patterns
+    return len(resolver.reverse_dict)
+
+
+def prime_certificate_fonts():
+    from reportlab.pdfbase import pdfmetrics
+    from PIL import Image
+    import courses.certificate  # noqa: F401, pulls in the reportlab canvas modules
+
+    Image.init()
+    for font in CERTIFICATE_FONTS:
+        # stringWidth loads and caches the AFM metrics of the standard fonts
+        pdfmetrics.stringWidth("Certificate of Completion", font, 12)
+    return len(CERTIFICATE_FONTS)
+
+
+def warm_up():
+    """
+    Do the one-off work a worker would otherwise pay for on its first requests.
+
+    Meant to run in the gunicorn master with preload_app, so forked workers inherit the result.
+    Returns the seconds spent per step.
+    """
+    timings = {}
+    start = time.perf_counter()
+    _setup_django()
+    timings['django'] = time.perf_counter() - start
+
+    for name, step in (('templates', compile_templates), ('urls', prime_url_resolver), ('certificate', prime_certificate_fonts)):
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+
+    # connections must not be shared between forked workers
+    from django.db import connections
+    connections.close_all()
+    return timings
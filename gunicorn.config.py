@@ -1,3 +1,4 @@
+import gc
 import multiprocessing
 
 wsgi_app = "elearner.wsgi:application"
@@ -6,6 +7,7 @@ workers = multiprocessing.cpu_count() * 2 + 1  # Recommended formula for workers
 worker_class = "sync"  # Default worker class
 threads = 2  # Number of threads per worker
 timeout = 30  # Time in seconds for a request to complete
+preload_app = True  # Load Django once in the master, workers are forked from the warmed-up process
 accesslog = "/var/log/elearner/gunicorn/access.log"  # Log file for access logs
 errorlog = "/var/log/elearner/gunicorn/error.log"  # Log file for error logs
 loglevel = "info"  # Logging level: debug, info, warning, error, critical
@@ -13,3 +15,23 @@ loglevel = "info"  # Logging level: debug, info, warning, error, critical
 capture_output = True
 # Daemonize the Gunicorn process (detach & enter background)
 daemon = True
+
+
+def on_starting(server):
+    # runs in the master after the preloaded app is imported, before any worker is forked
+    from elearner.metrics import reset_metrics_dir
+    from elearner.warmup import warm_up
+
+    # counters start from zero with every run, files of the previous master's workers would inflate them
+    reset_metrics_dir()
+    timings = warm_up()
+    server.log.info("Warm-up finished: %s", ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    # keep the preloaded objects out of the collector, so workers don't copy their memory pages on the first GC run
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # keep the requests a recycled worker served since its last periodic write
+    from elearner.metrics import registry
+
+    registry.flush(force=True)